@@ -3,7 +3,11 @@ from crewai import Crew, Task
 from agents.price_discovery_agent import create_price_discovery_agent
 from agents.negotiation_strategist_agent import create_negotiation_strategist_agent
 from agents.communicator_agent import create_communicator_agent
+from agents.history_compactor import get_history_compactor
 from agents.supervisor_agent import SupervisorAgent
+from tools.location_tools import normalize_location
+from tools.price_tools import format_price_info, normalize_commodity_name, price_service
+import config
 
 
 class MandiSaathiCrew:
@@ -12,7 +16,7 @@ class MandiSaathiCrew:
 
     Uses a Supervisor Agent to route queries to appropriate agents:
     - GREETING: Direct response from supervisor
-    - PRICE_ONLY: Price Discovery -> Communicator
+    - PRICE_ONLY: Direct price lookup -> Communicator (Price Discovery agent as fallback)
     - NEGOTIATION_WITH_CONTEXT: Negotiation -> Communicator
     - FULL_WORKFLOW: Price Discovery -> Negotiation -> Communicator
     - MISSING_INFO: Direct response asking for details
@@ -23,6 +27,9 @@ class MandiSaathiCrew:
         # Initialize supervisor for intelligent routing
         self.supervisor = SupervisorAgent()
 
+        # Shared by the supervisor prompt and every task description
+        self.history_compactor = get_history_compactor()
+
         # Create agents (lazy initialization - only when needed)
         self._price_discovery_agent = None
         self._negotiation_strategist_agent = None
@@ -52,20 +59,8 @@ class MandiSaathiCrew:
             self._communicator_agent = create_communicator_agent()
         return self._communicator_agent
 
-    def _format_chat_history(self, chat_history: list) -> str:
-        """Format chat history into a readable string for agent context"""
-        if not chat_history:
-            return ""
-
-        lines = []
-        for msg in chat_history:
-            lines.append(f"Farmer: {msg.get('user', '')}")
-            lines.append(f"Assistant: {msg.get('assistant', '')}")
-        return "\n".join(lines)
-
-    def _create_price_only_tasks(self, farmer_message: str, chat_history: list, context_data: dict) -> list:
+    def _create_price_only_tasks(self, farmer_message: str, history_text: str, context_data: dict) -> list:
         """Create tasks for price-only workflow: Price Discovery -> Communicator"""
-        history_text = self._format_chat_history(chat_history)
         history_block = self._get_history_block(history_text)
         extracted = context_data.get("extracted_info", {})
 
@@ -130,9 +125,58 @@ class MandiSaathiCrew:
 
         return [price_discovery_task, communication_task]
 
-    def _create_negotiation_with_context_tasks(self, farmer_message: str, chat_history: list, context_data: dict) -> list:
+    def _create_price_only_fast_task(self, farmer_message: str, history_text: str, context_data: dict):
+        """
+        Look up prices directly and return a single Communicator task, or None
+        when the extracted fields are incomplete or no price data is found.
+
+        Only exact or alias location matches are used; a name that needs a
+        spelling correction goes through the Price Discovery agent, which
+        reports the correction to the farmer.
+        """
+        extracted = context_data.get("extracted_info") or {}
+        if not (extracted.get("state") and extracted.get("district") and extracted.get("commodity")):
+            return None
+
+        state, district, corrected = normalize_location(extracted["state"], extracted["district"])
+        if not (state and district) or corrected:
+            return None
+        commodity = normalize_commodity_name(extracted["commodity"])
+        price_data = price_service.get_market_prices(state, district, commodity)
+        if not price_data:
+            return None
+
+        history_block = self._get_history_block(history_text)
+        price_info = format_price_info(state, district, commodity, price_data)
+
+        return Task(
+            description=f"""Deliver the price information to the farmer in their language:
+            CONVERSATION HISTORY: {history_block}
+            Farmer's CURRENT Message: "{farmer_message}"
+
+            PRICE DATA (already fetched and verified):
+            {price_info}
+
+            Your tasks:
+            1. Detect the farmer's language (Hindi/English/Hinglish)
+            2. Match their tone (formal vs casual)
+            3. Provide the price information clearly
+            4. Mention nearby market prices for comparison
+            5. Keep it concise (maximum 3-4 sentences)
+
+            NOTE: This is a price inquiry only - do NOT provide negotiation advice.
+            """,
+            expected_output="""A concise, farmer-friendly response that:
+            - Matches the farmer's language and tone
+            - States current market price clearly
+            - Mentions price range
+            - Includes nearby market prices for reference
+            """,
+            agent=self.communicator_agent
+        )
+
+    def _create_negotiation_with_context_tasks(self, farmer_message: str, history_text: str, context_data: dict) -> list:
         """Create tasks when price context is available: Negotiation -> Communicator"""
-        history_text = self._format_chat_history(chat_history)
         history_block = self._get_history_block(history_text)
         extracted = context_data.get("extracted_info", {})
         price_context = context_data.get("price_from_history", {})
@@ -211,9 +255,8 @@ class MandiSaathiCrew:
 
         return [negotiation_strategy_task, communication_task]
 
-    def _create_full_workflow_tasks(self, farmer_message: str, chat_history: list, context_data: dict) -> list:
+    def _create_full_workflow_tasks(self, farmer_message: str, history_text: str, context_data: dict) -> list:
         """Create tasks for full workflow: Price Discovery -> Negotiation -> Communicator"""
-        history_text = self._format_chat_history(chat_history)
         history_block = self._get_history_block(history_text)
         extracted = context_data.get("extracted_info", {})
         today = date.today().strftime("%d %B %Y")
@@ -346,17 +389,23 @@ class MandiSaathiCrew:
         ---
         """
 
-    def run(self, farmer_message: str, chat_history: list = None) -> str:
-        """Execute the intelligent workflow based on supervisor's routing decision"""
+    def run(self, farmer_message: str, chat_history: list = None, session_id: str = None) -> str:
+        """
+        Execute the intelligent workflow based on supervisor's routing decision.
+
+        With a session_id, the summary of older turns is kept per session so
+        each turn is summarised once.
+        """
         try:
             self.farmer_message = farmer_message
+            history_text = self.history_compactor.compact(chat_history, session_id)
 
             # Step 1: Supervisor analyzes the query
             print("\n" + "="*50)
             print("SUPERVISOR: Analyzing query...")
             print("="*50)
 
-            analysis = self.supervisor.analyze_query(farmer_message, chat_history)
+            analysis = self.supervisor.analyze_query(farmer_message, chat_history, history_text=history_text)
             intent, direct_response, context_data = self.supervisor.get_workflow_decision(analysis)
 
             print(f"SUPERVISOR DECISION:")
@@ -378,22 +427,32 @@ class MandiSaathiCrew:
             tasks = []
             agents = []
 
-            if intent == SupervisorAgent.INTENT_PRICE_ONLY:
+            fast_task = None
+            if intent == SupervisorAgent.INTENT_PRICE_ONLY and config.PRICE_FAST_PATH_ENABLED:
+                fast_task = self._create_price_only_fast_task(farmer_message, history_text, context_data)
+
+            if fast_task:
+                print("SUPERVISOR: Routing to PRICE_ONLY fast path")
+                print("  Agents: Communicator (prices fetched directly)")
+                tasks = [fast_task]
+                agents = [self.communicator_agent]
+
+            elif intent == SupervisorAgent.INTENT_PRICE_ONLY:
                 print("SUPERVISOR: Routing to PRICE_ONLY workflow")
                 print("  Agents: Price Discovery -> Communicator")
-                tasks = self._create_price_only_tasks(farmer_message, chat_history, context_data)
+                tasks = self._create_price_only_tasks(farmer_message, history_text, context_data)
                 agents = [self.price_discovery_agent, self.communicator_agent]
 
             elif intent == SupervisorAgent.INTENT_NEGOTIATION_WITH_CONTEXT:
                 print("SUPERVISOR: Routing to NEGOTIATION_WITH_CONTEXT workflow")
                 print("  Agents: Negotiation -> Communicator (using price from history)")
-                tasks = self._create_negotiation_with_context_tasks(farmer_message, chat_history, context_data)
+                tasks = self._create_negotiation_with_context_tasks(farmer_message, history_text, context_data)
                 agents = [self.negotiation_strategist_agent, self.communicator_agent]
 
             else:  # FULL_WORKFLOW or fallback
                 print("SUPERVISOR: Routing to FULL_WORKFLOW")
                 print("  Agents: Price Discovery -> Negotiation -> Communicator")
-                tasks = self._create_full_workflow_tasks(farmer_message, chat_history, context_data)
+                tasks = self._create_full_workflow_tasks(farmer_message, history_text, context_data)
                 agents = [
                     self.price_discovery_agent,
                     self.negotiation_strategist_agent,
@@ -0,0 +1,206 @@
+import copy
+import hashlib
+import json
+import math
+import re
+import threading
+from typing import Any, Dict, List, Optional
+import config
+from database.db_manager import DatabaseManager
+from tools.entity_extractor import get_entity_extractor
+
+# Amounts quoted by the assistant, e.g. "₹1,800" or "Rs 1800"
+QUOTED_PRICE_PATTERN = re.compile(r"(?:₹|rs\.?)\s*(\d+(?:,\d{2,3})*)", re.IGNORECASE)
+SENTENCE_END = re.compile(r"(?<=[.!?।])\s")
+
+MAX_LISTED_VALUES = 3  # Offers, prices and advice kept in the summary
+ADVICE_CHARS = 160
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return math.ceil(len(text) / 4)
+
+
+def _turn_fingerprint(turn: Dict) -> str:
+    raw = f"{turn.get('user', '')}\x1f{turn.get('assistant', '')}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _empty_summary() -> Dict[str, Any]:
+    return {
+        "commodity": None,
+        "location": None,
+        "offers": [],
+        "market_prices": [],
+        "advice": [],
+        "turns": 0,
+        "last_turn": None
+    }
+
+
+def _append_recent(values: List, value):
+    if value in values:
+        values.remove(value)
+    values.append(value)
+    del values[:-MAX_LISTED_VALUES]
+
+
+class HistoryCompactor:
+    """
+    Builds the conversation history text used in every LLM prompt.
+
+    The last keep_turns turns are kept verbatim; older turns are folded into
+    a rolling summary of commodity, location, trader offers, quoted market
+    prices and advice given. With a session_id the summary is stored in
+    session_summaries, so each turn is folded only once. The result is kept
+    within token_budget by folding further turns and, as a last resort,
+    shortening the remaining messages.
+    """
+
+    def __init__(self, db_manager: DatabaseManager = None, keep_turns: int = None, token_budget: int = None):
+        self.db = db_manager
+        self.keep_turns = config.HISTORY_KEEP_TURNS if keep_turns is None else keep_turns
+        self.token_budget = config.HISTORY_TOKEN_BUDGET if token_budget is None else token_budget
+        self.extractor = get_entity_extractor()
+
+    def compact(self, chat_history: list, session_id: str = None) -> str:
+        """Return the prompt-ready history text for a conversation"""
+        if not chat_history:
+            return ""
+
+        split = max(len(chat_history) - self.keep_turns, 0)
+        older, recent = list(chat_history[:split]), list(chat_history[split:])
+
+        stored = self._load_summary(session_id) if session_id else None
+        summary = copy.deepcopy(stored) if stored else _empty_summary()
+        self._fold_new_turns(summary, older)
+        if session_id and older and summary != stored:
+            self._save_summary(session_id, summary)
+
+        # Over budget: fold more turns (not persisted), then shorten what is left
+        text = self._render(summary, recent)
+        while estimate_tokens(text) > self.token_budget and len(recent) > 1:
+            self._fold_turn(summary, recent.pop(0))
+            text = self._render(summary, recent)
+        if estimate_tokens(text) > self.token_budget:
+            text = self._render(summary, recent, max_chars=self._chars_per_message(summary, len(recent)))
+        return text
+
+    def format_verbatim(self, chat_history: list) -> str:
+        """Format turns as Farmer/Assistant lines"""
+        lines = []
+        for msg in chat_history or []:
+            lines.append(f"Farmer: {msg.get('user', '')}")
+            lines.append(f"Assistant: {msg.get('assistant', '')}")
+        return "\n".join(lines)
+
+    def _fold_new_turns(self, summary: Dict, older: list):
+        """Fold the older turns that come after the last one already summarised"""
+        start = 0
+        if summary["last_turn"]:
+            fingerprints = [_turn_fingerprint(turn) for turn in older]
+            if summary["last_turn"] in fingerprints:
+                start = len(fingerprints) - fingerprints[::-1].index(summary["last_turn"])
+            elif len(older) <= summary["turns"]:
+                # The last summarised turn is outside this window; folding these
+                # turns again would count them twice
+                return
+        for turn in older[start:]:
+            self._fold_turn(summary, turn)
+
+    def _fold_turn(self, summary: Dict, turn: Dict):
+        user_message = turn.get("user", "")
+        assistant_response = turn.get("assistant", "")
+
+        entities = self.extractor.extract(user_message)
+        if entities["commodity"]:
+            summary["commodity"] = entities["commodity"]
+        if entities["district"] or entities["state"]:
+            summary["location"] = ", ".join(part for part in (entities["district"], entities["state"]) if part)
+        if entities["offered_price"] is not None:
+            _append_recent(summary["offers"], entities["offered_price"])
+
+        for amount in QUOTED_PRICE_PATTERN.findall(assistant_response):
+            _append_recent(summary["market_prices"], int(amount.replace(",", "")))
+        advice = SENTENCE_END.split(assistant_response.strip(), maxsplit=1)[0]
+        if advice:
+            _append_recent(summary["advice"], advice[:ADVICE_CHARS])
+
+        summary["turns"] += 1
+        summary["last_turn"] = _turn_fingerprint(turn)
+
+    def _render(self, summary: Dict, recent: list, max_chars: int = None) -> str:
+        parts = []
+        if summary["turns"]:
+            facts = [f"{summary['turns']} earlier turns"]
+            if summary["commodity"]:
+                facts.append(f"Commodity: {summary['commodity']}")
+            if summary["location"]:
+                facts.append(f"Location: {summary['location']}")
+            if summary["offers"]:
+                facts.append("Trader offers: " + ", ".join(f"₹{offer}" for offer in summary["offers"]))
+            if summary["market_prices"]:
+                facts.append("Prices quoted: " + ", ".join(f"₹{price}" for price in summary["market_prices"]))
+            if summary["advice"]:
+                facts.append("Advice given: " + " / ".join(summary["advice"]))
+            parts.append("Summary of earlier conversation: " + " | ".join(facts))
+
+        if max_chars is not None:
+            recent = [
+                {key: self._shorten(value, max_chars) for key, value in turn.items() if key in ("user", "assistant")}
+                for turn in recent
+            ]
+        if recent:
+            parts.append(self.format_verbatim(recent))
+        return "\n".join(parts)
+
+    def _chars_per_message(self, summary: Dict, turn_count: int) -> int:
+        """Characters each remaining message may use once the summary and labels are counted"""
+        messages = 2 * max(turn_count, 1)
+        available = self.token_budget * 4 - len(self._render(summary, [])) - messages * len("Assistant: \n")
+        return max(available // messages, 100)
+
+    @staticmethod
+    def _shorten(text: str, max_chars: int) -> str:
+        return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+    def _load_summary(self, session_id: str) -> Optional[Dict]:
+        if self.db is None:
+            return None
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT summary FROM session_summaries WHERE session_id = ?", (session_id,))
+            row = cursor.fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _save_summary(self, session_id: str, summary: Dict):
+        if self.db is None:
+            return
+        payload = json.dumps(summary)
+        self.db.submit_write(lambda conn: conn.execute("""
+            INSERT INTO session_summaries (session_id, summary, turns_covered, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (session_id) DO UPDATE SET
+                summary = excluded.summary,
+                turns_covered = excluded.turns_covered,
+                updated_at = excluded.updated_at
+        """, (session_id, payload, summary["turns"])))
+
+
+_history_compactor = None
+_history_compactor_lock = threading.Lock()
+
+
+def get_history_compactor() -> HistoryCompactor:
+    """Process-wide compactor storing summaries in the application database"""
+    global _history_compactor
+    with _history_compactor_lock:
+        if _history_compactor is None:
+            db_manager = DatabaseManager(
+                config.DATABASE_PATH,
+                write_behind=config.WRITE_BEHIND_ENABLED,
+                write_behind_settings=config.WRITE_BEHIND_SETTINGS
+            )
+            _history_compactor = HistoryCompactor(db_manager)
+        return _history_compactor
@@ -0,0 +1,240 @@
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+import config
+from tools.location_tools import INDIAN_STATES, STATE_ALIASES
+from tools.price_tools import COMMODITY_MAPPINGS
+
+
+# Words that make up a pure greeting or thanks (plus polite filler)
+GREETING_WORDS = {
+    "hi", "hii", "hello", "helo", "hey", "namaste", "namaskar", "namaskaar", "pranam",
+    "salaam", "salam", "नमस्ते", "नमस्कार", "प्रणाम",
+}
+# Greetings whose words mean something else alone ("kisan", "ram", "good")
+GREETING_PHRASES = (
+    "jai kisan", "jai shri ram", "jai sri ram", "ram ram", "sat sri akal",
+    "good morning", "good evening", "good afternoon",
+)
+GREETING_PHRASE_PATTERN = re.compile(r"\b(?:" + "|".join(GREETING_PHRASES) + r")\b")
+THANKS_WORDS = {
+    "thanks", "thank", "thankyou", "thx", "dhanyavaad", "dhanyavad", "dhanyawad",
+    "shukriya", "shukria", "धन्यवाद", "शुक्रिया",
+}
+FILLER_WORDS = {
+    "ji", "bhai", "bhaiya", "sir", "you", "very", "much", "so", "a", "lot", "ok", "okay",
+    "bahut", "aapka", "aap", "to", "there", "mandi", "saathi", "sathi", "जी",
+}
+ENGLISH_WORDS = {
+    "hi", "hii", "hello", "helo", "hey", "good", "morning", "evening", "afternoon",
+    "thanks", "thank", "thankyou", "thx", "you", "very", "much", "so", "a", "lot",
+    "ok", "okay", "sir", "there",
+}
+
+
+def _whole_message(pattern: str):
+    """Match a service question only when it is the entire message, give or take a greeting"""
+    return re.compile(
+        r"^\s*(?:(?:hi|hello|hey|namaste|bhai|ji|sir|ok)[\s,]+)*" + pattern
+        + r"(?:[\s,]+(?:ji|bhai|sir))*\s*[?!.]*\s*$"
+    )
+
+
+# Questions about the service itself
+GENERAL_QUERY_PATTERNS_EN = [
+    _whole_message(pattern) for pattern in (
+        r"what (can|do) you do",
+        r"who are you",
+        r"how (does|do) (this|it|you) work",
+        r"what is (this|mandi saathi)",
+        r"how (can|do) you help( me)?",
+        r"help",
+    )
+]
+GENERAL_QUERY_PATTERNS_HI = [
+    _whole_message(pattern) for pattern in (
+        r"(aap|tum) (kaun|kon) (ho|hain|hai)",
+        r"(aap|tum) kya kar (sakte|sakti) (ho|hain)",
+        r"(ye|yeh) kya hai",
+        r"((ye|yeh|mandi saathi) )?(kaise|kese) kaam karta hai",
+        r"madad",
+    )
+]
+
+TOKEN_PATTERN = re.compile(r"\d+|[^\s\d.,!?;:'\"()\-/]+")
+
+# Words showing the farmer wants a price or negotiation answer
+PRICE_INTENT_WORDS = {
+    "price", "prices", "rate", "rates", "bhav", "bhaav", "bhao", "daam", "dam", "keemat",
+    "kimat", "mandi", "sell", "selling", "bech", "bechna", "bechni", "offer", "offering",
+    "trader", "vyapari", "byapari", "negotiate", "quintal", "kg", "kilo",
+    "भाव", "दाम", "कीमत", "मंडी",
+}
+
+# Connecting words of a price question ("ka bhav kya hai", "what is the rate of")
+QUESTION_WORDS = {
+    "ka", "ki", "ke", "ko", "se", "kya", "hai", "hain", "h", "mein", "me", "mai", "main", "aaj", "abhi",
+    "kitna", "kitni", "kitne", "batao", "bataiye", "bataye", "bata", "dijiye", "do", "chahiye", "janna",
+    "jaanna", "mera", "meri", "mere", "mujhe", "wala", "wali", "aur", "bhi", "raha", "rahi", "rahe",
+    "what", "whats", "is", "the", "of", "for", "today", "todays", "current", "my", "in", "at", "how",
+    "please", "plz", "pls", "tell", "give", "know", "want", "rs", "rupaye", "per",
+    "का", "की", "के", "क्या", "है", "आज",
+}
+
+GREETING_RESPONSE = "Namaste! Mein Mandi Saathi hoon. Aapki fasal ka bhav jaanne ya mandi saudebazi mein madad ke liye poochein."
+GREETING_RESPONSE_EN = "Hello! I'm Mandi Saathi. Ask me about today's mandi price for your crop or how to negotiate with a trader."
+THANKS_RESPONSE = "Aapka swagat hai! Jab bhi fasal ka bhav ya saudebazi mein madad chahiye, bas poochiye."
+THANKS_RESPONSE_EN = "You're welcome! Ask me any time you need a mandi price or negotiation help."
+GENERAL_RESPONSE = (
+    "Mein Mandi Saathi hoon. Aap mujhe apni fasal, state aur district bataiye - mein aaj ka mandi bhav bataunga "
+    "aur trader ke offer par accha daam dilwane mein madad karunga. Hindi, English ya Hinglish, kisi mein bhi likhiye."
+)
+GENERAL_RESPONSE_EN = (
+    "I'm Mandi Saathi. Tell me your crop, state and district - I'll give you today's mandi price "
+    "and help you get a fair deal on the trader's offer. You can write in Hindi, English or Hinglish."
+)
+MISSING_BOTH_RESPONSE = "Zaroor madad karunga! Kaunsi fasal hai aur aap kis state aur district ki mandi mein hain?"
+MISSING_LOCATION_RESPONSE = "Zaroor! {commodity} ka bhav kis mandi ka chahiye? Apna state aur district bata dijiye."
+
+
+class IntentPreClassifier:
+    """
+    Resolves obvious intents locally before the supervisor calls the LLM.
+
+    Only GREETING, GENERAL_QUERY and clear MISSING_INFO messages are handled;
+    anything else returns None and goes to the LLM. Results use the same
+    analysis dict shape as SupervisorAgent.analyze_query.
+    """
+
+    ROUTE_LLM = "llm"
+
+    def __init__(self, enabled: bool = None, log_every: int = None):
+        self.enabled = config.INTENT_PRECLASSIFIER_ENABLED if enabled is None else enabled
+        self.log_every = config.INTENT_ROUTE_LOG_EVERY if log_every is None else log_every
+        self._routes = Counter()
+        self._lock = threading.Lock()
+
+        self._commodity_words = set(COMMODITY_MAPPINGS)
+        self._location_words = set()
+        self._location_phrases = []
+        for state, districts in INDIAN_STATES.items():
+            for name in [state] + [district.lower() for district in districts]:
+                if " " in name:
+                    self._location_phrases.append(name)
+                else:
+                    self._location_words.add(name)
+        # Two-letter aliases like "up" are too ambiguous to count as a location alone
+        self._location_words.update(alias for alias in STATE_ALIASES if len(alias) > 2)
+        self._known_words = (
+            self._commodity_words | PRICE_INTENT_WORDS | QUESTION_WORDS
+            | GREETING_WORDS | THANKS_WORDS | FILLER_WORDS
+            | {word for phrase in GREETING_PHRASES for word in phrase.split()}
+        )
+
+    def classify(self, farmer_message: str, chat_history: list = None) -> Optional[Dict[str, Any]]:
+        """Return an analysis dict for an obvious intent, or None to defer to the LLM"""
+        if not self.enabled:
+            return None
+
+        text = farmer_message.lower().strip()
+        tokens = TOKEN_PATTERN.findall(text)
+        if not tokens:
+            return None
+
+        commodity = next((token for token in tokens if token in self._commodity_words), None)
+        has_location = (
+            any(token in self._location_words for token in tokens)
+            or any(phrase in text for phrase in self._location_phrases)
+        )
+        has_number = any(token.isdigit() for token in tokens)
+        english = all(token in ENGLISH_WORDS for token in tokens)
+
+        if commodity or has_location or has_number or any(token in PRICE_INTENT_WORDS for token in tokens):
+            return self._classify_missing_info(tokens, commodity, has_location, chat_history)
+        # Mid-conversation, "ok" or "what is this" refers to the earlier turns
+        if chat_history:
+            return None
+
+        words = set(TOKEN_PATTERN.findall(GREETING_PHRASE_PATTERN.sub(" ", text)))
+        greeted = bool(GREETING_PHRASE_PATTERN.search(text)) or bool(words & (GREETING_WORDS | THANKS_WORDS))
+        if greeted and words <= GREETING_WORDS | THANKS_WORDS | FILLER_WORDS:
+            if words & THANKS_WORDS:
+                response = THANKS_RESPONSE_EN if english else THANKS_RESPONSE
+            else:
+                response = GREETING_RESPONSE_EN if english else GREETING_RESPONSE
+            return self._analysis("GREETING", 0.95, "Greeting or thanks matched the local lexicon", response)
+
+        if any(pattern.match(text) for pattern in GENERAL_QUERY_PATTERNS_HI):
+            return self._analysis("GENERAL_QUERY", 0.9, "Question about the service matched a local pattern",
+                                  GENERAL_RESPONSE)
+        if any(pattern.match(text) for pattern in GENERAL_QUERY_PATTERNS_EN):
+            return self._analysis("GENERAL_QUERY", 0.9, "Question about the service matched a local pattern",
+                                  GENERAL_RESPONSE_EN)
+
+        return self._classify_missing_info(tokens, commodity, has_location, chat_history)
+
+    def _classify_missing_info(self, tokens: List[str], commodity: Optional[str], has_location: bool,
+                               chat_history: list) -> Optional[Dict[str, Any]]:
+        """
+        Ask for details only when nothing in the conversation could supply them.
+
+        Every word must be known: an unrecognised word may be a market or crop
+        outside the local tables ("Lasalgaon", "Patna"), so the LLM decides.
+        """
+        if chat_history or has_location:
+            return None
+        if any(not token.isdigit() and token not in self._known_words for token in tokens):
+            return None
+        if not commodity and not any(token in PRICE_INTENT_WORDS for token in tokens):
+            return None
+
+        if commodity:
+            commodity_name = COMMODITY_MAPPINGS[commodity]
+            analysis = self._analysis(
+                "MISSING_INFO", 0.85, "Commodity given but no location, and no earlier conversation",
+                MISSING_LOCATION_RESPONSE.format(commodity=commodity_name),
+                missing_fields=["state", "district"]
+            )
+            analysis["extracted_info"]["commodity"] = commodity_name
+            return analysis
+
+        return self._analysis(
+            "MISSING_INFO", 0.85, "Price help asked without commodity or location, and no earlier conversation",
+            MISSING_BOTH_RESPONSE, missing_fields=["commodity", "state", "district"]
+        )
+
+    def _analysis(self, intent: str, confidence: float, reasoning: str, direct_response: str,
+                  missing_fields: List[str] = None) -> Dict[str, Any]:
+        return {
+            "intent": intent,
+            "confidence": confidence,
+            "reasoning": f"Local pre-classifier: {reasoning}",
+            "extracted_info": {"state": None, "district": None, "commodity": None, "offered_price": None, "quantity": None},
+            "price_from_history": {"available": False, "commodity": None, "modal_price": None, "location": None},
+            "missing_fields": missing_fields or [],
+            "direct_response": direct_response
+        }
+
+    def record_route(self, route: str):
+        """Count which path handled a query and periodically log the split"""
+        with self._lock:
+            self._routes[route] += 1
+            total = sum(self._routes.values())
+            should_log = self.log_every > 0 and total % self.log_every == 0
+        if should_log:
+            stats = self.get_stats()
+            print(f"Intent routing after {stats['total']} queries: {stats['routes']} "
+                  f"(local {stats['local_ratio']:.0%})")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return per-route counts and the share of queries resolved locally"""
+        with self._lock:
+            routes = dict(self._routes)
+        total = sum(routes.values())
+        local = total - routes.get(self.ROUTE_LLM, 0)
+        return {
+            "total": total,
+            "routes": routes,
+            "local_ratio": local / total if total else 0.0
+        }
@@ -0,0 +1,148 @@
+import copy
+import hashlib
+import json
+import re
+import threading
+from typing import Any, Dict, Optional
+import config
+from database.db_manager import DatabaseManager
+from database.memory_cache import TTLCache
+
+# Bump when the supervisor prompt or analysis format changes, so decisions
+# made under the old prompt are not reused
+ROUTING_CACHE_VERSION = "2"
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace; digits are kept"""
+    text = re.sub(r"[^\w\s]", " ", message.lower())
+    return " ".join(text.split())
+
+
+class RoutingCache:
+    """
+    Caches supervisor analysis results for repeated messages.
+
+    Entries are keyed on the normalised message, a hash of the chat history
+    given to the supervisor and the model name. Lookups go through an
+    in-process LRU first, then the routing_cache table, so decisions survive
+    restarts. Entries expire after ttl_hours; the table keeps at most
+    max_entries rows, dropping the least recently used.
+    """
+
+    def __init__(self, db_manager: DatabaseManager, ttl_hours: float = None, max_entries: int = None,
+                 memory_size: int = 500):
+        self.db = db_manager
+        self.ttl_hours = config.ROUTING_CACHE_TTL_HOURS if ttl_hours is None else ttl_hours
+        self.max_entries = max_entries or config.ROUTING_CACHE_MAX_ENTRIES
+        self._memory = TTLCache(maxsize=memory_size, default_ttl=self.ttl_hours * 3600)
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._db_hits = 0
+        self._misses = 0
+        self._stores = 0
+
+    def make_key(self, farmer_message: str, history_text: str, model: str) -> str:
+        """Stable cache key for a message in the context of its history"""
+        history_hash = hashlib.sha256(history_text.encode("utf-8")).hexdigest()
+        raw = "\x1f".join([ROUTING_CACHE_VERSION, model, normalize_message(farmer_message), history_hash])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached analysis, or None"""
+        analysis = self._memory.get(key)
+        if analysis is not None:
+            self._count("_memory_hits")
+            return copy.deepcopy(analysis)
+
+        query = """
+            SELECT analysis, (julianday(created_at) - julianday('now')) * 86400 + ? * 3600
+            FROM routing_cache
+            WHERE cache_key = ?
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (self.ttl_hours, key))
+            row = cursor.fetchone()
+
+        # row[1] is the remaining TTL in seconds
+        if not row or row[1] <= 0:
+            self._count("_misses")
+            return None
+
+        analysis = json.loads(row[0])
+        self._memory.set(key, analysis, ttl=row[1])
+        self.db.submit_write(lambda conn: conn.execute(
+            "UPDATE routing_cache SET last_used_at = CURRENT_TIMESTAMP, hits = hits + 1 WHERE cache_key = ?",
+            (key,)
+        ))
+        self._count("_db_hits")
+        return copy.deepcopy(analysis)
+
+    def set(self, key: str, analysis: Dict[str, Any]):
+        """Store an analysis and trim the table to max_entries"""
+        payload = json.dumps(analysis)
+        max_entries = self.max_entries
+
+        def write(conn):
+            conn.execute("""
+                INSERT OR REPLACE INTO routing_cache (cache_key, analysis, created_at, last_used_at, hits)
+                VALUES (?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, 0)
+            """, (key, payload))
+            conn.execute("""
+                DELETE FROM routing_cache
+                WHERE cache_key IN (
+                    SELECT cache_key FROM routing_cache
+                    ORDER BY last_used_at DESC
+                    LIMIT -1 OFFSET ?
+                )
+            """, (max_entries,))
+
+        self._memory.set(key, copy.deepcopy(analysis))
+        self.db.submit_write(write)
+        self._count("_stores")
+
+    def cleanup_expired(self) -> int:
+        """Delete expired rows and return how many were removed"""
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM routing_cache WHERE created_at < datetime('now', '-' || ? || ' hours')",
+                (self.ttl_hours,)
+            )
+            return cursor.rowcount
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit, miss and store counters and the overall hit rate"""
+        with self._lock:
+            hits = self._memory_hits + self._db_hits
+            lookups = hits + self._misses
+            return {
+                "memory_hits": self._memory_hits,
+                "db_hits": self._db_hits,
+                "misses": self._misses,
+                "stores": self._stores,
+                "hit_rate": hits / lookups if lookups else 0.0
+            }
+
+
+_routing_cache = None
+_routing_cache_lock = threading.Lock()
+
+
+def get_routing_cache() -> RoutingCache:
+    """Process-wide routing cache backed by the application database"""
+    global _routing_cache
+    with _routing_cache_lock:
+        if _routing_cache is None:
+            db_manager = DatabaseManager(
+                config.DATABASE_PATH,
+                write_behind=config.WRITE_BEHIND_ENABLED,
+                write_behind_settings=config.WRITE_BEHIND_SETTINGS
+            )
+            _routing_cache = RoutingCache(db_manager)
+        return _routing_cache
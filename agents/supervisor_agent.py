@@ -1,8 +1,44 @@
 from openai import OpenAI
+from pydantic import BaseModel, field_validator
 import config
 import json
-import re
-from typing import Tuple, Dict, Any, Optional
+from typing import Tuple, Dict, Any, List, Literal, Optional
+from agents.history_compactor import get_history_compactor
+from agents.intent_classifier import IntentPreClassifier
+from agents.routing_cache import get_routing_cache
+from tools.entity_extractor import get_entity_extractor
+
+
+class ExtractedInfo(BaseModel):
+    state: Optional[str]
+    district: Optional[str]
+    commodity: Optional[str]
+    offered_price: Optional[float]
+    quantity: Optional[str]
+
+
+class PriceFromHistory(BaseModel):
+    available: bool
+    commodity: Optional[str]
+    modal_price: Optional[float]
+    location: Optional[str]
+
+
+class SupervisorAnalysis(BaseModel):
+    """Structured output returned by the supervisor model"""
+    intent: Literal["GREETING", "PRICE_ONLY", "NEGOTIATION_WITH_CONTEXT", "FULL_WORKFLOW",
+                    "MISSING_INFO", "GENERAL_QUERY"]
+    confidence: float
+    reasoning: str
+    extracted_info: ExtractedInfo
+    price_from_history: PriceFromHistory
+    missing_fields: List[str]
+    direct_response: Optional[str]
+
+    @field_validator("confidence")
+    @classmethod
+    def clamp_confidence(cls, value: float) -> float:
+        return min(max(value, 0.0), 1.0)
 
 
 class SupervisorAgent:
@@ -26,14 +62,23 @@ class SupervisorAgent:
     INTENT_MISSING_INFO = "MISSING_INFO"
     INTENT_GENERAL_QUERY = "GENERAL_QUERY"
 
+    EXTRACTED_FIELDS = ("state", "district", "commodity", "offered_price", "quantity")
+
     def __init__(self):
         self.client = OpenAI(api_key=config.OPENAI_API_KEY)
         self.model = config.SUPERVISOR_MODEL
+        self.pre_classifier = IntentPreClassifier()
+        self.entity_extractor = get_entity_extractor()
+        self.routing_cache = get_routing_cache() if config.ROUTING_CACHE_ENABLED else None
 
-    def analyze_query(self, farmer_message: str, chat_history: list = None) -> Dict[str, Any]:
+    def analyze_query(self, farmer_message: str, chat_history: list = None,
+                      history_text: str = None) -> Dict[str, Any]:
         """
         Analyze the farmer's query and determine the appropriate workflow.
 
+        history_text is the already compacted history; it is built from
+        chat_history when not given.
+
         Returns:
             Dict containing:
             - intent: The classified intent
@@ -42,10 +87,35 @@ class SupervisorAgent:
             - extracted_info: Any extracted location, commodity, price info
         """
 
-        history_text = self._format_chat_history(chat_history)
+        # Obvious greetings, service questions and missing details need no LLM call
+        local_analysis = self.pre_classifier.classify(farmer_message, chat_history)
+        if local_analysis:
+            self.pre_classifier.record_route(f"local:{local_analysis['intent']}")
+            return local_analysis
+
+        # Complete deal details in a fresh conversation can be routed without the LLM
+        entities = self.entity_extractor.extract(farmer_message)
+        extraction_analysis = self._analysis_from_entities(entities, chat_history)
+        if extraction_analysis:
+            self.pre_classifier.record_route(f"local:{extraction_analysis['intent']}")
+            return extraction_analysis
+
+        if history_text is None:
+            history_text = self._format_chat_history(chat_history)
 
-        analysis_prompt = f"""You are a supervisor agent for Mandi Saathi, a farming price advisory system.
-Analyze the farmer's message and determine the appropriate action.
+        # Repeated messages with the same history reuse the earlier decision
+        cache_key = None
+        if self.routing_cache:
+            cache_key = self.routing_cache.make_key(farmer_message, history_text, self.model)
+            cached_analysis = self.routing_cache.get(cache_key)
+            if cached_analysis:
+                self.pre_classifier.record_route("cache")
+                return cached_analysis
+        self.pre_classifier.record_route(IntentPreClassifier.ROUTE_LLM)
+
+        known_fields = {field: entities[field] for field in self.EXTRACTED_FIELDS if entities[field] is not None}
+
+        analysis_prompt = f"""Route this message for Mandi Saathi, a mandi price and negotiation assistant for farmers.
 
 CONVERSATION HISTORY:
 ---
@@ -54,99 +124,93 @@ CONVERSATION HISTORY:
 
 FARMER'S CURRENT MESSAGE: "{farmer_message}"
 
-TASK: Analyze the intent and extract relevant information.
-
-INTENT CATEGORIES:
-1. GREETING - Simple greetings like "hello", "hi", "namaste", "thanks", "dhanyavaad", casual conversation
-2. PRICE_ONLY - User only wants to know the current market price (not negotiating)
-3. NEGOTIATION_WITH_CONTEXT - User wants negotiation advice AND price data is already available in chat history
-4. FULL_WORKFLOW - User wants negotiation advice but needs price discovery first
-5. MISSING_INFO - User wants help but hasn't provided essential info (location OR commodity)
-6. GENERAL_QUERY - General questions about the service, how it works, etc.
-
-CONTEXT DETECTION RULES:
-- For NEGOTIATION_WITH_CONTEXT: Check if chat history already contains:
-  * Market price for the commodity user is asking about
-  * The same location context
-  * If user mentions an offered price AND history has market price -> NEGOTIATION_WITH_CONTEXT
-
-- For PRICE_ONLY: User asks things like:
-  * "What's the price of wheat in Delhi?"
-  * "Tamatar ka bhav kya hai Ballia mein?"
-  * No mention of trader's offer or negotiation
-
-- For FULL_WORKFLOW: User mentions:
-  * A trader's offered price AND
-  * Needs price discovery (no recent price in history for same commodity/location)
-
-- For MISSING_INFO: User wants price/negotiation help but:
-  * Missing location (state/district) AND can't be inferred from history
-  * OR missing commodity name AND can't be inferred from history
-
-EXTRACTION RULES:
-- Extract state, district, commodity, offered_price if mentioned
-- Check chat history for previously mentioned info
-- Look for Hindi/Hinglish terms (tamatar=tomato, aloo=potato, pyaz=onion, gehu=wheat)
-
-Respond in this exact JSON format:
-{{
-    "intent": "<GREETING|PRICE_ONLY|NEGOTIATION_WITH_CONTEXT|FULL_WORKFLOW|MISSING_INFO|GENERAL_QUERY>",
-    "confidence": <0.0-1.0>,
-    "reasoning": "<brief explanation of why this intent>",
-    "extracted_info": {{
-        "state": "<extracted state or null>",
-        "district": "<extracted district or null>",
-        "commodity": "<extracted commodity in English or null>",
-        "offered_price": <extracted offered price as number or null>,
-        "quantity": "<extracted quantity or null>"
-    }},
-    "price_from_history": {{
-        "available": <true|false>,
-        "commodity": "<commodity if available>",
-        "modal_price": <price if available or null>,
-        "location": "<location if available>"
-    }},
-    "missing_fields": ["<list of missing required fields if MISSING_INFO>"],
-    "direct_response": "<response text if GREETING, MISSING_INFO, or GENERAL_QUERY, else null>"
-}}
-
-IMPORTANT for direct_response:
-- For GREETING: Respond warmly in the same language as the farmer (Hindi/English/Hinglish)
-- For MISSING_INFO: Politely ask for the missing information in farmer's language
-- For GENERAL_QUERY: Explain Mandi Saathi's capabilities in farmer's language
-- Keep responses concise and friendly
-
-Examples of direct_response:
-- GREETING (Hindi): "Namaste! Mein Mandi Saathi hoon. Aap apni fasal ka bhav jaanne ya mandi mein saudebazi mein madad ke liye mujhse pooch sakte hain."
-- MISSING_INFO: "Bhai, kaunsi mandi ka bhav chahiye? State aur district bata do."
-- GENERAL_QUERY: "Mein aapko mandi ke bhav batata hoon aur trader se accha dam dilwane mein madad karta hoon."
+LOCALLY EXTRACTED FROM THE MESSAGE (verify, then reuse): {json.dumps(known_fields) if known_fields else "nothing"}
+
+INTENTS:
+- GREETING: hello, namaste, thanks, casual talk
+- PRICE_ONLY: wants the current market price, no trader offer or negotiation
+- NEGOTIATION_WITH_CONTEXT: wants negotiation advice and the history already has the market price for the same commodity and location
+- FULL_WORKFLOW: mentions a trader's offer and needs fresh price discovery
+- MISSING_INFO: wants price/negotiation help but the commodity or location is missing and cannot be inferred from history
+- GENERAL_QUERY: questions about the service itself
+
+RULES:
+- extracted_info: state, district, commodity (in English), offered_price, quantity from the message or history; null if unknown
+- Hindi/Hinglish terms: tamatar=tomato, aloo=potato, pyaz=onion, gehu=wheat
+- price_from_history: the market price already given in the history, if any
+- missing_fields: only for MISSING_INFO
+- direct_response: only for GREETING, MISSING_INFO and GENERAL_QUERY, otherwise null. One or two short, friendly sentences in the farmer's language, e.g. "Bhai, kaunsi mandi ka bhav chahiye? State aur district bata do."
+- reasoning: one short sentence
 """
 
         try:
-            response = self.client.chat.completions.create(
+            completion = self.client.beta.chat.completions.parse(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": "You are a routing supervisor for an agricultural advisory system. Respond only in valid JSON format."},
+                    {"role": "system", "content": "You are a routing supervisor for an agricultural advisory system."},
                     {"role": "user", "content": analysis_prompt}
                 ],
+                response_format=SupervisorAnalysis,  # Schema-constrained, parsed and validated by the SDK
                 temperature=0.3,  # Lower temperature for consistent routing
-                max_completion_tokens=1000
+                # Routing needs no reasoning; hidden reasoning tokens would use up
+                # the completion cap and truncate the JSON (LengthFinishReasonError)
+                reasoning_effort=config.SUPERVISOR_REASONING_EFFORT,
+                max_completion_tokens=config.SUPERVISOR_MAX_COMPLETION_TOKENS
             )
 
-            response_text = response.choices[0].message.content
-
-            # Extract JSON from response
-            json_match = re.search(r'\{[\s\S]*\}', response_text)
-            if json_match:
-                analysis = json.loads(json_match.group())
+            message = completion.choices[0].message
+            if message.parsed is not None:
+                analysis = message.parsed.model_dump()
+                # Fill fields the LLM left empty from the local extraction
+                for field, value in known_fields.items():
+                    if analysis["extracted_info"].get(field) in (None, ""):
+                        analysis["extracted_info"][field] = value
+                if cache_key:
+                    self.routing_cache.set(cache_key, analysis)
                 return analysis
-            else:
-                # Fallback if JSON parsing fails
-                return self._fallback_analysis(farmer_message, chat_history)
+
+            print(f"Supervisor returned no analysis: {message.refusal or 'empty response'}")
+            analysis = self._fallback_analysis(farmer_message, chat_history)
 
         except Exception as e:
+            # Includes truncated output (LengthFinishReasonError) and schema validation errors
             print(f"Supervisor analysis error: {e}")
-            return self._fallback_analysis(farmer_message, chat_history)
+            analysis = self._fallback_analysis(farmer_message, chat_history)
+
+        # The fallback still carries whatever was extracted locally
+        analysis["extracted_info"].update(known_fields)
+        return analysis
+
+    def get_routing_stats(self) -> Dict[str, Any]:
+        """Return how queries were routed and the routing cache hit rate"""
+        return {
+            "routes": self.pre_classifier.get_stats(),
+            "routing_cache": self.routing_cache.get_stats() if self.routing_cache else None
+        }
+
+    def _analysis_from_entities(self, entities: Dict[str, Any], chat_history: list = None) -> Optional[Dict[str, Any]]:
+        """Route PRICE_ONLY / FULL_WORKFLOW locally when extraction is complete and unambiguous"""
+        if not config.ENTITY_EXTRACTOR_SKIP_LLM or not entities["confident"] or chat_history:
+            return None
+
+        if entities["offered_price"] is not None:
+            intent = self.INTENT_FULL_WORKFLOW
+            reasoning = "Commodity, location and trader's offer extracted locally"
+        elif entities["asks_price"]:
+            intent = self.INTENT_PRICE_ONLY
+            reasoning = "Price asked for a locally extracted commodity and location"
+        else:
+            return None
+
+        return {
+            "intent": intent,
+            "confidence": 0.9,
+            "reasoning": f"Local entity extractor: {reasoning}",
+            "extracted_info": {field: entities[field] for field in self.EXTRACTED_FIELDS},
+            "price_from_history": {"available": False, "commodity": None, "modal_price": None, "location": None},
+            "missing_fields": [],
+            "direct_response": None
+        }
 
     def _fallback_analysis(self, farmer_message: str, chat_history: list = None) -> Dict[str, Any]:
         """Fallback analysis when LLM fails"""
@@ -177,15 +241,8 @@ Examples of direct_response:
         }
 
     def _format_chat_history(self, chat_history: list) -> str:
-        """Format chat history into a readable string"""
-        if not chat_history:
-            return ""
-
-        lines = []
-        for msg in chat_history:
-            lines.append(f"Farmer: {msg.get('user', '')}")
-            lines.append(f"Assistant: {msg.get('assistant', '')}")
-        return "\n".join(lines)
+        """Format chat history into a readable string, summarising older turns"""
+        return get_history_compactor().compact(chat_history)
 
     def get_workflow_decision(self, analysis: Dict[str, Any]) -> Tuple[str, Optional[str], Dict[str, Any]]:
         """
@@ -1,4 +1,5 @@
 import streamlit as st
+import config
 from agents.crew_manager import MandiSaathiCrew
 from database.db_manager import DatabaseManager
 from database.session_manager import SessionManager
@@ -344,10 +345,17 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+SESSIONS_PER_PAGE = 10  # Sidebar chats shown per "Load more" page
+SEARCH_RESULTS_LIMIT = 20  # Sidebar chats shown for a search
+
 # Initialize database and session manager
 @st.cache_resource
 def init_database():
-    db_manager = DatabaseManager()
+    db_manager = DatabaseManager(
+        config.DATABASE_PATH,
+        write_behind=config.WRITE_BEHIND_ENABLED,
+        write_behind_settings=config.WRITE_BEHIND_SETTINGS
+    )
     session_manager = SessionManager(db_manager)
     return db_manager, session_manager
 
@@ -367,6 +375,19 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "current_session_loaded" not in st.session_state:
     st.session_state.current_session_loaded = False
+if "session_pages" not in st.session_state:
+    st.session_state.session_pages = 1
+if "window_size" not in st.session_state:
+    st.session_state.window_size = config.CHAT_WINDOW_SIZE
+if "has_earlier_messages" not in st.session_state:
+    st.session_state.has_earlier_messages = False
+
+def load_chat_window(session_id: str, limit: int):
+    """Replace the visible messages with the latest `limit` messages of a session"""
+    window = session_manager.retrieve_chat_window(session_id, limit=limit)
+    st.session_state.messages = window["messages"]
+    st.session_state.window_size = limit
+    st.session_state.has_earlier_messages = window["has_more"]
 
 # Sidebar for chat history
 with st.sidebar:
@@ -382,20 +403,36 @@ with st.sidebar:
     if st.button("➕ New Chat", use_container_width=True, type="primary"):
         st.session_state.session_id = None
         st.session_state.messages = []
+        st.session_state.window_size = config.CHAT_WINDOW_SIZE
+        st.session_state.has_earlier_messages = False
         st.session_state.current_session_loaded = False
         st.rerun()
     
     st.markdown("<br>", unsafe_allow_html=True)
     st.markdown("---")
     
-    # Load previous sessions
-    sessions = session_manager.get_all_sessions()
+    # Search past conversations
+    search_query = st.text_input("🔍 Search chats", placeholder="e.g. pyaz Nashik").strip()
+    
+    sessions = []
+    cursor = None
+    if search_query:
+        sessions = session_manager.search(search_query, limit=SEARCH_RESULTS_LIMIT)
+        heading = "Search Results"
+    else:
+        # Load previous sessions, one keyset page per "Load more" click
+        for _ in range(st.session_state.session_pages):
+            page, cursor = session_manager.list_sessions(SESSIONS_PER_PAGE, before=cursor)
+            sessions.extend(page)
+            if cursor is None:
+                break
+        heading = "Recent Chats"
     
     if sessions:
-        st.markdown("#### Recent Chats")
+        st.markdown(f"#### {heading}")
         st.markdown("<br>", unsafe_allow_html=True)
         
-        for session in sessions[:10]:  # Show last 10 sessions
+        for session in sessions:
             # Create a preview of the first message
             preview = session["first_message"][:40] + "..." if len(session["first_message"]) > 40 else session["first_message"]
             
@@ -411,13 +448,19 @@ with st.sidebar:
                 ):
                     # Load this session
                     st.session_state.session_id = session["session_id"]
-                    st.session_state.messages = session_manager.retrieve_chat_history(session["session_id"])
+                    load_chat_window(session["session_id"], config.CHAT_WINDOW_SIZE)
                     st.session_state.current_session_loaded = True
                     st.rerun()
             
             # Show session info
             st.caption(f"📅 {session['last_updated'][:16]} • {session['message_count']} msgs")
             st.markdown("<br>", unsafe_allow_html=True)
+        
+        if cursor is not None and st.button("Load more", use_container_width=True):
+            st.session_state.session_pages += 1
+            st.rerun()
+    elif search_query:
+        st.info("🔍 No conversations match your search")
     else:
         st.info("💭 No previous conversations yet")
 
@@ -453,6 +496,23 @@ if not st.session_state.messages:
     **Example:** *"Mera 5 quintal tamatar hai, trader 1500 bol raha hai, Ballia mandi mein hoon"*
     """)
 
+# Fetch older messages only when asked for
+if st.session_state.has_earlier_messages and st.button("⬆️ Load earlier messages"):
+    oldest = st.session_state.messages[0] if st.session_state.messages else {}
+    if "id" in oldest:
+        window = session_manager.retrieve_chat_window(
+            st.session_state.session_id,
+            limit=config.CHAT_WINDOW_SIZE,
+            before_id=oldest["id"]
+        )
+        st.session_state.messages = window["messages"] + st.session_state.messages
+        st.session_state.window_size += config.CHAT_WINDOW_SIZE
+        st.session_state.has_earlier_messages = window["has_more"]
+    else:
+        # The oldest visible turn was added in this run and has no id yet
+        load_chat_window(st.session_state.session_id, st.session_state.window_size + config.CHAT_WINDOW_SIZE)
+    st.rerun()
+
 # Display chat messages
 for message in st.session_state.messages:
     with st.chat_message("user", avatar="🧑‍🌾"):
@@ -470,17 +530,20 @@ if prompt := st.chat_input("Type your message in any language..."):
     with st.chat_message("user", avatar="🧑‍🌾"):
         st.markdown(prompt)
     
-    # Capture full chat history before appending current message
-    chat_history = list(st.session_state.messages)
+    # Capture recent chat history before appending current message
+    chat_history = st.session_state.messages[-config.CHAT_CONTEXT_TURNS:] if config.CHAT_CONTEXT_TURNS > 0 else []
 
-    # Add to messages
+    # Add to messages, keeping only the visible window in memory
     st.session_state.messages.append({"user": prompt, "assistant": ""})
+    if len(st.session_state.messages) > st.session_state.window_size:
+        st.session_state.messages = st.session_state.messages[-st.session_state.window_size:]
+        st.session_state.has_earlier_messages = True
 
     # Get response from crew
     with st.chat_message("assistant", avatar="👨‍💼"):
         with st.spinner("🌾 Analyzing market prices and preparing your advice..."):
             try:
-                response = crew.run(prompt, chat_history)
+                response = crew.run(prompt, chat_history, session_id=st.session_state.session_id)
                 st.markdown(response)
                 
                 # Update the last message with response
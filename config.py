@@ -11,18 +11,56 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 DATA_GOV_API_KEY = os.getenv("DATA_GOV_API_KEY", "")
 DATA_GOV_RESOURCE_ID = "35985678-0d79-46b4-9ed6-6f13308a1d24"
 DATA_GOV_API_URL = "https://api.data.gov.in/resource"
+API_TIMEOUT_SECONDS = int(os.getenv("API_TIMEOUT_SECONDS", "15"))
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "10"))  # Max keep-alive connections to data.gov.in
+PRICE_STATE_SLICE_LIMIT = int(os.getenv("PRICE_STATE_SLICE_LIMIT", "500"))  # Records per state x commodity lookup
+API_MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "3"))
+API_RETRY_BASE_DELAY = float(os.getenv("API_RETRY_BASE_DELAY", "0.5"))  # seconds
+API_RETRY_DEADLINE_SECONDS = float(os.getenv("API_RETRY_DEADLINE_SECONDS", "20"))
+API_BREAKER_FAILURE_THRESHOLD = int(os.getenv("API_BREAKER_FAILURE_THRESHOLD", "5"))
+API_BREAKER_COOLDOWN_SECONDS = float(os.getenv("API_BREAKER_COOLDOWN_SECONDS", "60"))
 
 # Database Configuration
 DATABASE_PATH = os.getenv("DATABASE_PATH", "mandi_saathi.db")
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"  # Batch chat/cache writes off the request path
+WRITE_BEHIND_SETTINGS = {
+    "max_queue": int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "1000")),
+    "batch_size": int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "100")),
+    "flush_interval": int(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_MS", "200")) / 1000,
+    "synchronous": os.getenv("WRITE_BEHIND_SYNCHRONOUS", "NORMAL"),  # FULL trades latency for durability
+}
 
 # Cache Configuration
 CACHE_VALIDITY_HOURS = int(os.getenv("CACHE_VALIDITY_HOURS", "24"))
+CACHE_STALE_GRACE_HOURS = int(os.getenv("CACHE_STALE_GRACE_HOURS", "24"))  # Serve expired prices this long while refreshing
+NEGATIVE_CACHE_TTL_MINUTES = int(os.getenv("NEGATIVE_CACHE_TTL_MINUTES", "15"))  # Remember "no data" answers
+MEMORY_CACHE_SIZE = int(os.getenv("MEMORY_CACHE_SIZE", "1000"))  # Max prices held in process memory
+MEMORY_CACHE_STATE_TTL_SECONDS = int(os.getenv("MEMORY_CACHE_STATE_TTL_SECONDS", "300"))  # Neighbour price lists
+
+# Chat History Configuration
+CHAT_WINDOW_SIZE = int(os.getenv("CHAT_WINDOW_SIZE", "20"))  # Messages rendered per "load earlier" page
+CHAT_CONTEXT_TURNS = int(os.getenv("CHAT_CONTEXT_TURNS", "10"))  # Recent turns passed to the agents
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "4"))  # Turns quoted verbatim in prompts; older ones are summarised
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1200"))  # Max history tokens per prompt
+CHAT_COMPRESS_MIN_BYTES = int(os.getenv("CHAT_COMPRESS_MIN_BYTES", "1024"))  # zlib-compress longer responses (0 disables)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "chat_archive")  # Segment files for archived sessions
+ARCHIVE_IDLE_DAYS = int(os.getenv("ARCHIVE_IDLE_DAYS", "90"))  # Archive sessions idle longer than this
+ARCHIVE_SEGMENT_MAX_BYTES = int(os.getenv("ARCHIVE_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
 
 # Agent Configuration
 SUPERVISOR_MODEL = "gpt-5.2"  # Critical for routing decisions
+SUPERVISOR_MAX_COMPLETION_TOKENS = int(os.getenv("SUPERVISOR_MAX_COMPLETION_TOKENS", "300"))  # The analysis is a small JSON object
+SUPERVISOR_REASONING_EFFORT = os.getenv("SUPERVISOR_REASONING_EFFORT", "none")  # Reasoning tokens count against the cap above; use "minimal" for gpt-5
 AGENT_MODEL = "gpt-5.2"  # For price discovery and negotiation agents
 COMMUNICATOR_MODEL = "gpt-5-mini"  # Faster model for communication
 AGENT_TEMPERATURE = 0.7
+PRICE_FAST_PATH_ENABLED = os.getenv("PRICE_FAST_PATH_ENABLED", "true").lower() == "true"  # PRICE_ONLY: fetch prices directly, one Communicator call
+INTENT_PRECLASSIFIER_ENABLED = os.getenv("INTENT_PRECLASSIFIER_ENABLED", "true").lower() == "true"  # Route obvious intents without the LLM
+ENTITY_EXTRACTOR_SKIP_LLM = os.getenv("ENTITY_EXTRACTOR_SKIP_LLM", "true").lower() == "true"  # Route complete deal messages without the LLM
+ROUTING_CACHE_ENABLED = os.getenv("ROUTING_CACHE_ENABLED", "true").lower() == "true"  # Reuse supervisor decisions for repeated messages
+ROUTING_CACHE_TTL_HOURS = float(os.getenv("ROUTING_CACHE_TTL_HOURS", "24"))
+ROUTING_CACHE_MAX_ENTRIES = int(os.getenv("ROUTING_CACHE_MAX_ENTRIES", "5000"))
+INTENT_ROUTE_LOG_EVERY = int(os.getenv("INTENT_ROUTE_LOG_EVERY", "50"))  # Log the local/LLM split every N queries (0 disables)
 
 # Validation
 if not OPENAI_API_KEY:
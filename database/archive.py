@@ -0,0 +1,236 @@
+"""
+Archival of idle chat sessions to compressed JSONL segment files.
+
+Sessions not updated for a number of days are moved out of chat_sessions and
+chat_messages into append-only segment files under the archive directory.
+Each session is written as one JSON line in its own gzip member, and its
+segment, byte offset and length are kept in the archived_sessions table, so
+a single session is read back with one seek. A session that receives a new
+message is moved back into the database before the message is stored.
+
+Run from the command line:
+    python -m database.archive --days 30
+
+or from a scheduler:
+    from database.archive import run_archive_job
+    run_archive_job(days=30)
+"""
+import argparse
+import gzip
+import json
+import os
+import time
+from typing import Dict, List, Optional
+from database.db_manager import DatabaseManager
+from database.text_codec import decompress_text
+import config
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl.gz"
+
+
+class ChatArchive:
+    """Moves idle sessions to segment files and reads them back"""
+
+    def __init__(self, db_manager: DatabaseManager, archive_dir: str = None,
+                 segment_max_bytes: int = None, batch_size: int = 100):
+        self.db = db_manager
+        self.archive_dir = archive_dir or config.ARCHIVE_DIR
+        self.segment_max_bytes = segment_max_bytes or config.ARCHIVE_SEGMENT_MAX_BYTES
+        self.batch_size = batch_size
+
+    def archive_idle_sessions(self, days: int) -> Dict:
+        """Archive every session idle for more than `days` days"""
+        start = time.time()
+        sessions = 0
+        messages = 0
+
+        self.db.flush_writes()
+        os.makedirs(self.archive_dir, exist_ok=True)
+        while True:
+            archived_sessions, archived_messages = self._archive_batch(days)
+            if not archived_sessions:
+                break
+            sessions += archived_sessions
+            messages += archived_messages
+
+        result = {
+            "sessions": sessions,
+            "messages": messages,
+            "seconds": round(time.time() - start, 2)
+        }
+        print(f"Archived {sessions} sessions ({messages} messages) in {result['seconds']}s")
+        return result
+
+    def _archive_batch(self, days: int):
+        """Archive up to batch_size idle sessions in one transaction"""
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            # Selected inside the write transaction so no new message can slip in
+            cursor.execute("""
+                SELECT session_id, created_at, last_updated, first_message, message_count
+                FROM chat_sessions
+                WHERE last_updated < datetime('now', '-' || ? || ' days')
+                ORDER BY last_updated
+                LIMIT ?
+            """, (days, self.batch_size))
+            sessions = cursor.fetchall()
+            if not sessions:
+                return 0, 0
+
+            entries = []
+            message_count = 0
+            for session in sessions:
+                cursor.execute("""
+                    SELECT id, user_message, assistant_response, created_at
+                    FROM chat_messages
+                    WHERE session_id = ?
+                    ORDER BY id
+                """, (session[0],))
+                session_messages = [
+                    {
+                        "id": row[0],
+                        "user": row[1],
+                        "assistant": decompress_text(row[2]),
+                        "timestamp": row[3]
+                    }
+                    for row in cursor.fetchall()
+                ]
+                message_count += len(session_messages)
+                entries.append(({
+                    "session_id": session[0],
+                    "created_at": session[1],
+                    "last_updated": session[2],
+                    "first_message": session[3],
+                    "message_count": session[4]
+                }, session_messages))
+
+            # Segment data is synced before the rows are deleted, so a crash
+            # can at worst leave an unindexed (and ignored) copy behind
+            locations = self._append_to_segment(entries)
+
+            cursor.executemany("""
+                INSERT OR REPLACE INTO archived_sessions
+                    (session_id, segment, offset, length, created_at, last_updated,
+                     first_message, message_count, archived_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, [
+                (summary["session_id"], segment, offset, length, summary["created_at"],
+                 summary["last_updated"], summary["first_message"], summary["message_count"])
+                for (summary, _), (segment, offset, length) in zip(entries, locations)
+            ])
+            session_ids = [(summary["session_id"],) for summary, _ in entries]
+            # The contentless search index can only forget the text it was given
+            cursor.executemany("""
+                INSERT INTO chat_messages_fts (chat_messages_fts, rowid, user_message, assistant_response)
+                VALUES ('delete', ?, ?, ?)
+            """, [
+                (message["id"], message["user"], message["assistant"])
+                for _, session_messages in entries
+                for message in session_messages
+            ])
+            cursor.executemany("DELETE FROM chat_messages WHERE session_id = ?", session_ids)
+            cursor.executemany("DELETE FROM chat_sessions WHERE session_id = ?", session_ids)
+
+        return len(entries), message_count
+
+    def _append_to_segment(self, entries: List) -> List:
+        """Append one gzip member per session and return (segment, offset, length) for each"""
+        segment = self._current_segment()
+        path = os.path.join(self.archive_dir, segment)
+        locations = []
+
+        with open(path, "ab") as segment_file:
+            offset = segment_file.tell()
+            for summary, session_messages in entries:
+                line = json.dumps({"session": summary, "messages": session_messages}, ensure_ascii=False)
+                member = gzip.compress((line + "\n").encode("utf-8"))
+                segment_file.write(member)
+                locations.append((segment, offset, len(member)))
+                offset += len(member)
+            segment_file.flush()
+            os.fsync(segment_file.fileno())
+
+        return locations
+
+    def _current_segment(self) -> str:
+        """Name of the newest segment, starting a new one once it is full"""
+        segments = sorted(
+            name for name in os.listdir(self.archive_dir)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+        if segments:
+            latest = segments[-1]
+            if os.path.getsize(os.path.join(self.archive_dir, latest)) < self.segment_max_bytes:
+                return latest
+            number = int(latest[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) + 1
+        else:
+            number = 1
+        return f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}"
+
+    def load_session(self, session_id: str) -> Optional[Dict]:
+        """Read an archived session as {"session": summary, "messages": [...]}"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT segment, offset, length FROM archived_sessions WHERE session_id = ?",
+                (session_id,)
+            )
+            row = cursor.fetchone()
+        if not row:
+            return None
+        return self._read_entry(session_id, *row)
+
+    def unarchive_session(self, conn, session_id: str) -> Optional[Dict]:
+        """
+        Take a session out of the archive index inside the caller's transaction.
+
+        Returns the archived session and messages for the caller to insert
+        back into the database, or None when the session is not archived (or
+        its segment cannot be read, in which case it stays archived).
+        """
+        row = conn.execute(
+            "SELECT segment, offset, length FROM archived_sessions WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()
+        if not row:
+            return None
+
+        entry = self._read_entry(session_id, *row)
+        if entry is not None:
+            # The segment copy stays behind, unindexed and ignored
+            conn.execute("DELETE FROM archived_sessions WHERE session_id = ?", (session_id,))
+        return entry
+
+    def _read_entry(self, session_id: str, segment: str, offset: int, length: int) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.archive_dir, segment), "rb") as segment_file:
+                segment_file.seek(offset)
+                member = segment_file.read(length)
+            return json.loads(gzip.decompress(member).decode("utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"Error reading archived session {session_id}: {e}")
+            return None
+
+
+def run_archive_job(days: int = None, db_path: str = None, archive_dir: str = None) -> Dict:
+    """Entry point for schedulers: archive sessions idle for more than `days` days"""
+    db_manager = DatabaseManager(db_path or config.DATABASE_PATH)
+    archive = ChatArchive(db_manager, archive_dir=archive_dir)
+    return archive.archive_idle_sessions(days if days is not None else config.ARCHIVE_IDLE_DAYS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move idle chat sessions to compressed archive segments")
+    parser.add_argument("--days", type=int, default=config.ARCHIVE_IDLE_DAYS,
+                        help="Archive sessions not updated for more than this many days")
+    parser.add_argument("--db", default=config.DATABASE_PATH, help="SQLite database path")
+    parser.add_argument("--dir", dest="archive_dir", default=config.ARCHIVE_DIR,
+                        help="Directory holding the archive segments")
+    args = parser.parse_args()
+
+    run_archive_job(days=args.days, db_path=args.db, archive_dir=args.archive_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,266 @@
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from database.db_manager import DatabaseManager
+from database.memory_cache import TTLCache
 import config
 
+# One row per (state, district, commodity, variety, market_date); a newer price replaces it
+UPSERT_PRICE_QUERY = """
+    INSERT INTO market_prices 
+    (state, district, commodity, modal_price, min_price, max_price, variety, grade, market_date)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (state, district, commodity, variety, market_date) DO UPDATE SET
+        modal_price = excluded.modal_price,
+        min_price = excluded.min_price,
+        max_price = excluded.max_price,
+        grade = excluded.grade,
+        cached_at = CURRENT_TIMESTAMP
+"""
+
 class CacheManager:
     """Manages caching for market prices and location data"""
     
     def __init__(self, db_manager: DatabaseManager):
         self.db = db_manager
         self.cache_validity_hours = config.CACHE_VALIDITY_HOURS
+        self.negative_ttl_minutes = config.NEGATIVE_CACHE_TTL_MINUTES
+        # Hot prices are served from memory; SQLite is the second tier
+        self._memory = TTLCache(
+            maxsize=config.MEMORY_CACHE_SIZE,
+            default_ttl=self.cache_validity_hours * 3600
+        )
+    
+    def _remember_price(self, state: str, district: str, commodity: str, price: Dict, ttl: float = None):
+        """Write a price through to the in-memory tier"""
+        self._memory.set((state, district, commodity), price, ttl)
+        self._memory.delete(("miss", state, district, commodity))
+    
+    def _forget_state_prices(self, pairs):
+        """Drop memoised state slices for (state, commodity) pairs that just got new prices"""
+        pairs = set(pairs)
+        self._memory.delete_where(lambda key: key[0] == "state_prices" and (key[1], key[2]) in pairs)
+    
+    def _price_from_record(self, record: Dict, cached_at: str) -> Dict:
+        """Build the cached price shape from a parsed API record"""
+        return {
+            "modal_price": record["modal_price"],
+            "min_price": record["min_price"],
+            "max_price": record["max_price"],
+            "variety": record["variety"],
+            "grade": record["grade"],
+            "market_date": record["price_date"],
+            "cached_at": cached_at
+        }
+    
+    def get_cache_stats(self) -> Dict:
+        """Return in-memory tier hit/miss counters"""
+        return self._memory.get_stats()
     
     def store_market_price(self, state: str, district: str, commodity: str, 
                           modal_price: float, min_price: float, max_price: float,
                           variety: str = None, grade: str = None, market_date: str = None):
-        """Store market price data in cache"""
+        """Store market price data in cache, updating the row for the same key"""
+        def write(conn):
+            cursor = conn.cursor()
+            cursor.execute(UPSERT_PRICE_QUERY, (
+                state, district, commodity, modal_price, min_price, max_price,
+                variety or "", grade, market_date or ""
+            ))
+            cursor.execute(
+                "DELETE FROM price_misses WHERE state = ? AND district = ? AND commodity = ?",
+                (state, district, commodity)
+            )
+        
+        # The memory tier serves this price while the write may still be queued
+        self.db.submit_write(write)
+        self._forget_state_prices([(state, commodity)])
+        self._remember_price(state, district, commodity, {
+            "modal_price": modal_price,
+            "min_price": min_price,
+            "max_price": max_price,
+            "variety": variety or "",
+            "grade": grade,
+            "market_date": market_date or "",
+            "cached_at": _sqlite_now()
+        })
+    
+    def replace_market_prices_bulk(self, records: List[Dict], batch_size: int = 500) -> int:
+        """
+        Load parsed price records in one transaction.
+
+        Existing rows for the same market dates are replaced so a re-run of the
+        same daily snapshot leaves exactly the snapshot's prices for those dates.
+        """
+        market_dates = sorted({record["price_date"] for record in records})
+        rows = [_price_row(r) for r in records]
+        
+        # Queued upserts must land before the snapshot replaces their dates
+        self.db.flush_writes()
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "DELETE FROM market_prices WHERE market_date = ?",
+                [(market_date,) for market_date in market_dates]
+            )
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(UPSERT_PRICE_QUERY, rows[start:start + batch_size])
+            cursor.execute("DELETE FROM price_misses")
+        
+        # The snapshot replaced rows wholesale, drop anything memoised from before it
+        self._memory.clear()
+        return len(rows)
+    
+    def upsert_market_prices(self, records: List[Dict]) -> int:
+        """Insert or update parsed price records keyed on location, commodity, variety and date"""
+        rows = [_price_row(r) for r in records]
+        keys = [(r["state"], r["district"], r["commodity"]) for r in records]
+        
+        def write(conn):
+            cursor = conn.cursor()
+            cursor.executemany(UPSERT_PRICE_QUERY, rows)
+            cursor.executemany(
+                "DELETE FROM price_misses WHERE state = ? AND district = ? AND commodity = ?",
+                keys
+            )
+        
+        self.db.submit_write(write)
+        
+        # Batches may hold several dates per key (usually newest first); memory
+        # must serve the same latest date that get_cached_price reads from SQLite
+        newest = {}
+        for r in records:
+            key = (r["state"], r["district"], r["commodity"])
+            if key not in newest or (r["price_date"] or "") > (newest[key]["price_date"] or ""):
+                newest[key] = r
+        
+        cached_at = _sqlite_now()
+        for key, r in newest.items():
+            self._remember_price(*key, self._price_from_record(r, cached_at))
+        self._forget_state_prices((state, commodity) for state, _, commodity in newest)
+        return len(records)
+    
+    def get_sync_watermarks(self) -> Dict[str, str]:
+        """Get the last ingested arrival date for every synced state"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT state, last_arrival_date FROM price_sync_state")
+            return {row[0]: row[1] for row in cursor.fetchall()}
+    
+    def record_sync_state(self, state_dates: Dict[str, str], state_counts: Dict[str, int],
+                          add_counts: bool = False):
+        """
+        Record the latest ingested arrival date and record count per state.
+
+        A full snapshot replaces the count; a delta sync passes add_counts so
+        its new records are added to the count of the snapshot before it.
+        """
+        query = f"""
+            INSERT INTO price_sync_state (state, last_arrival_date, record_count, synced_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (state) DO UPDATE SET
+                last_arrival_date = excluded.last_arrival_date,
+                record_count = {"record_count + " if add_counts else ""}excluded.record_count,
+                synced_at = excluded.synced_at
+        """
+        
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(query, [
+                (state, last_date, state_counts.get(state, 0))
+                for state, last_date in state_dates.items()
+            ])
+    
+    def has_fresh_snapshot(self, state: str) -> bool:
+        """Check if a bulk snapshot for the state was loaded within the cache validity window"""
         query = """
-            INSERT INTO market_prices 
-            (state, district, commodity, modal_price, min_price, max_price, variety, grade, market_date)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            SELECT 1 FROM price_sync_state
+            WHERE state = ? AND synced_at > datetime('now', '-' || ? || ' hours')
         """
         
-        self.db.execute_insert(query, (
-            state, district, commodity, modal_price, min_price, max_price,
-            variety, grade, market_date
-        ))
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (state, self.cache_validity_hours))
+            return cursor.fetchone() is not None
     
-    def get_cached_price(self, state: str, district: str, commodity: str) -> Optional[Dict]:
-        """Retrieve cached price if valid"""
+    def get_state_prices(self, state: str, commodity: str, exclude_district: str = None,
+                         limit: int = 3) -> List[Dict]:
+        """Get the latest valid price per district for a commodity across a state"""
+        memory_key = ("state_prices", state, commodity, exclude_district, limit)
+        remembered = self._memory.get(memory_key)
+        if remembered is not None:
+            return [dict(price) for price in remembered]
+        
+        query = """
+            SELECT district, modal_price, min_price, max_price, variety, grade, market_date, cached_at
+            FROM market_prices
+            WHERE state = ? AND commodity = ?
+              AND cached_at > datetime('now', '-' || ? || ' hours')
+            ORDER BY market_date DESC, cached_at DESC
+        """
+        
+        self.db.flush_writes()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (state, commodity, self.cache_validity_hours))
+            
+            prices = []
+            seen_districts = set()
+            for row in cursor:
+                district = row[0]
+                if district in seen_districts:
+                    continue
+                if exclude_district and district.lower() == exclude_district.lower():
+                    continue
+                seen_districts.add(district)
+                prices.append({
+                    "state": state,
+                    "district": district,
+                    "commodity": commodity,
+                    "modal_price": row[1],
+                    "min_price": row[2],
+                    "max_price": row[3],
+                    "variety": row[4],
+                    "grade": row[5],
+                    "market_date": row[6],
+                    "cached_at": row[7]
+                })
+                if len(prices) >= limit:
+                    break
+            
+            # An empty slice is not remembered: the next snapshot or API fetch may fill it
+            if prices:
+                self._memory.set(memory_key, prices, ttl=config.MEMORY_CACHE_STATE_TTL_SECONDS)
+            return [dict(price) for price in prices]
+    
+    def get_cached_price(self, state: str, district: str, commodity: str,
+                         allow_expired: bool = False) -> Optional[Dict]:
+        """Retrieve cached price if valid (or the latest one when allow_expired is set)"""
+        if not allow_expired:
+            remembered = self._memory.get((state, district, commodity))
+            if remembered:
+                return dict(remembered)
+        
         query = """
             SELECT modal_price, min_price, max_price, variety, grade, market_date, cached_at
             FROM market_prices
             WHERE state = ? AND district = ? AND commodity = ?
-            ORDER BY cached_at DESC
+            ORDER BY market_date DESC, cached_at DESC
             LIMIT 1
         """
         
-        conn = self.db.get_connection()
-        try:
+        self.db.flush_writes()
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, (state, district, commodity))
             row = cursor.fetchone()
             
             if row:
                 cached_at = datetime.fromisoformat(row[6])
-                validity_threshold = datetime.now() - timedelta(hours=self.cache_validity_hours)
+                # cached_at is UTC (CURRENT_TIMESTAMP)
+                validity_threshold = datetime.utcnow() - timedelta(hours=self.cache_validity_hours)
                 
-                if cached_at > validity_threshold:
-                    return {
+                if allow_expired or cached_at > validity_threshold:
+                    price = {
                         "modal_price": row[0],
                         "min_price": row[1],
                         "max_price": row[2],
@@ -55,9 +269,68 @@ class CacheManager:
                         "market_date": row[5],
                         "cached_at": row[6]
                     }
+                    remaining = (cached_at - validity_threshold).total_seconds()
+                    self._remember_price(state, district, commodity, price, ttl=remaining)
+                    return dict(price)
             return None
-        finally:
-            conn.close()
+    
+    def store_price_miss(self, state: str, district: str, commodity: str):
+        """Remember that a lookup returned no records, for a short time"""
+        if self.negative_ttl_minutes <= 0:
+            return
+        
+        query = """
+            INSERT OR REPLACE INTO price_misses (state, district, commodity, missed_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        """
+        self.db.submit_write(lambda conn: conn.execute(query, (state, district, commodity)))
+        self._memory.set(("miss", state, district, commodity), True, ttl=self.negative_ttl_minutes * 60)
+    
+    def is_known_miss(self, state: str, district: str, commodity: str,
+                      memory_only: bool = False) -> bool:
+        """Check if the lookup recently returned no records"""
+        if self.negative_ttl_minutes <= 0:
+            return False
+        
+        memory_key = ("miss", state, district, commodity)
+        if self._memory.get(memory_key):
+            return True
+        if memory_only:
+            return False
+        
+        query = """
+            SELECT (julianday(missed_at) - julianday('now')) * 86400 + ? * 60
+            FROM price_misses
+            WHERE state = ? AND district = ? AND commodity = ?
+        """
+        
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (self.negative_ttl_minutes, state, district, commodity))
+            row = cursor.fetchone()
+            if row and row[0] > 0:
+                # row[0] is the remaining TTL in seconds
+                self._memory.set(memory_key, True, ttl=row[0])
+                return True
+            return False
+    
+    def get_stale_price(self, state: str, district: str, commodity: str,
+                        grace_hours: float) -> Optional[Dict]:
+        """
+        Retrieve an expired price that is still within the stale grace window.
+
+        The returned price carries its age in hours as "age_hours".
+        """
+        price = self.get_cached_price(state, district, commodity, allow_expired=True)
+        if not price:
+            return None
+        
+        age_hours = (datetime.utcnow() - datetime.fromisoformat(price["cached_at"])).total_seconds() / 3600
+        if age_hours > self.cache_validity_hours + grace_hours:
+            return None
+        
+        price["age_hours"] = round(age_hours, 1)
+        return price
     
     def is_cache_valid(self, state: str, district: str, commodity: str) -> bool:
         """Check if cached data is still valid"""
@@ -82,14 +355,11 @@ class CacheManager:
             ORDER BY district
         """
         
-        conn = self.db.get_connection()
-        try:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, (state,))
             rows = cursor.fetchall()
             return [row[0] for row in rows]
-        finally:
-            conn.close()
     
     def cleanup_old_cache(self, days: int = 7):
         """Remove cache entries older than specified days"""
@@ -98,11 +368,28 @@ class CacheManager:
             WHERE cached_at < datetime('now', '-' || ? || ' days')
         """
         
-        conn = self.db.get_connection()
-        try:
+        with self.db.transaction() as conn:
             cursor = conn.cursor()
             cursor.execute(query, (days,))
-            conn.commit()
-            return cursor.rowcount
-        finally:
-            conn.close()
+            deleted = cursor.rowcount
+            cursor.execute(
+                "DELETE FROM price_misses WHERE missed_at < datetime('now', '-' || ? || ' minutes')",
+                (self.negative_ttl_minutes,)
+            )
+        
+        self._memory.clear()
+        return deleted
+
+
+def _price_row(record: Dict) -> tuple:
+    """Upsert parameters for a parsed API record"""
+    return (
+        record["state"], record["district"], record["commodity"], record["modal_price"],
+        record["min_price"], record["max_price"], record["variety"] or "", record["grade"],
+        record["price_date"] or ""
+    )
+
+
+def _sqlite_now() -> str:
+    """Current time in the format SQLite's CURRENT_TIMESTAMP produces"""
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
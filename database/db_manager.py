@@ -1,55 +1,156 @@
 import sqlite3
 import os
-from pathlib import Path
+import queue
+import threading
+from contextlib import contextmanager
+from database.migrations import ensure_migrated
+from database.write_behind import WriteBehindQueue
 
 class DatabaseManager:
     """Manages SQLite database connections and initialization"""
     
-    def __init__(self, db_path="mandi_saathi.db"):
+    # Applied to every connection; journal_mode=WAL lets readers run while one writer commits
+    CONNECTION_PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA busy_timeout=5000",
+        "PRAGMA cache_size=-16000",  # 16 MB page cache
+        "PRAGMA mmap_size=268435456",  # 256 MB memory-mapped I/O
+        "PRAGMA temp_store=MEMORY",
+    )
+    
+    def __init__(self, db_path="mandi_saathi.db", pool_size: int = 5, pool_timeout: float = 10.0,
+                 write_behind: bool = False, write_behind_settings: dict = None):
         self.db_path = db_path
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._pool_lock = threading.Lock()
+        self._created_connections = 0
         self.initialize_database()
+        
+        # Optional background batching for writes that need not block the caller
+        self.write_behind = None
+        if write_behind:
+            self.write_behind = WriteBehindQueue(
+                lambda: self._connect(autocommit=True),
+                **(write_behind_settings or {})
+            )
     
-    def get_connection(self):
-        """Get a database connection"""
-        conn = sqlite3.connect(self.db_path)
+    def _connect(self, autocommit: bool = False):
+        """Open a new connection with the standard pragmas applied"""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,  # Pooled connections move between Streamlit threads
+            isolation_level=None if autocommit else ""
+        )
         conn.row_factory = sqlite3.Row
+        for pragma in self.CONNECTION_PRAGMAS:
+            conn.execute(pragma)
         return conn
     
-    def initialize_database(self):
-        """Initialize database with schema"""
-        schema_path = Path(__file__).parent / "schema.sql"
+    def get_connection(self):
+        """Get a new standalone database connection (caller must close it)"""
+        return self._connect()
+    
+    def _acquire(self):
+        """Borrow a pooled connection, opening one if the pool is not yet full"""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
         
-        with open(schema_path, 'r') as f:
-            schema_sql = f.read()
+        with self._pool_lock:
+            if self._created_connections < self.pool_size:
+                self._created_connections += 1
+                try:
+                    return self._connect(autocommit=True)
+                except Exception:
+                    self._created_connections -= 1
+                    raise
         
-        conn = self.get_connection()
+        return self._pool.get(timeout=self.pool_timeout)
+    
+    def _release(self, conn):
+        """Return a connection to the pool, discarding any unfinished transaction"""
+        if conn.in_transaction:
+            conn.rollback()
+        self._pool.put_nowait(conn)
+    
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled autocommit connection for reads or single statements"""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+    
+    @contextmanager
+    def transaction(self):
+        """Borrow a pooled connection inside a write transaction, committed on success"""
+        conn = self._acquire()
         try:
-            conn.executescript(schema_sql)
+            # IMMEDIATE takes the write lock up front instead of failing on upgrade
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
             conn.commit()
         finally:
+            self._release(conn)
+    
+    def submit_write(self, write):
+        """
+        Apply a write callable taking a connection.
+
+        With write-behind enabled the write is queued and batched; otherwise it
+        runs in its own transaction before returning.
+        """
+        if self.write_behind is not None:
+            self.write_behind.submit(write)
+            return
+        with self.transaction() as conn:
+            write(conn)
+    
+    def flush_writes(self, timeout: float = 10.0) -> bool:
+        """Wait for queued write-behind writes to reach the database"""
+        if self.write_behind is None or not self.write_behind.pending():
+            return True
+        return self.write_behind.flush(timeout)
+    
+    def close(self):
+        """Flush queued writes and close all idle pooled connections"""
+        if self.write_behind is not None:
+            self.write_behind.close()
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
             conn.close()
+            with self._pool_lock:
+                self._created_connections -= 1
+    
+    def initialize_database(self):
+        """Apply pending schema migrations (once per database file per process)"""
+        ensure_migrated(self.db_path, lambda: self._connect(autocommit=True))
     
     def execute_query(self, query, params=None):
         """Execute a query and return results"""
-        conn = self.get_connection()
-        try:
+        with self.connection() as conn:
             cursor = conn.cursor()
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
-            conn.commit()
             return cursor.fetchall()
-        finally:
-            conn.close()
     
     def execute_insert(self, query, params):
         """Execute an insert query and return last row id"""
-        conn = self.get_connection()
-        try:
+        with self.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
-            conn.commit()
             return cursor.lastrowid
-        finally:
-            conn.close()
@@ -0,0 +1,364 @@
+"""
+Versioned schema migrations.
+
+Each migration runs once per database file and is recorded in the
+schema_version table. New schema changes are appended to MIGRATIONS with the
+next version number; applied migrations must never be edited.
+"""
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, List, Tuple, Union
+
+from database.text_codec import DEFAULT_COMPRESS_MIN_BYTES, compress_text, decompress_text, register_functions
+
+# Database files already brought up to date by this process
+_migrated_paths = set()
+_migrated_lock = threading.Lock()
+
+
+def _execute_script(conn, sql: str):
+    """Run a multi-statement script inside the caller's transaction"""
+    # executescript() would COMMIT first, so statements are run one at a time
+    statement = ""
+    for line in sql.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            if statement.strip():
+                conn.execute(statement)
+            statement = ""
+    if statement.strip():
+        conn.execute(statement)
+
+
+def _initial_schema(conn):
+    """Create the base schema, upgrading an append-only market_prices table if present"""
+    legacy_prices = _detach_legacy_market_prices(conn)
+    schema_path = Path(__file__).parent / "schema.sql"
+    with open(schema_path, 'r') as f:
+        _execute_script(conn, f.read())
+    if legacy_prices:
+        _import_legacy_market_prices(conn)
+
+
+def _detach_legacy_market_prices(conn) -> bool:
+    """Move an append-only market_prices table aside so the keyed schema can be created"""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'market_prices%'"
+    )
+    tables = {row[0] for row in cursor.fetchall()}
+    if "market_prices_legacy" in tables:
+        # A previous upgrade was interrupted before the import finished
+        return True
+    if "market_prices" not in tables:
+        return False
+
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_market_prices_key'"
+    )
+    if cursor.fetchone():
+        return False
+
+    cursor.execute("DROP INDEX IF EXISTS idx_market_prices_lookup")
+    cursor.execute("ALTER TABLE market_prices RENAME TO market_prices_legacy")
+    return True
+
+
+def _import_legacy_market_prices(conn):
+    """Copy the latest row per key from the legacy table, then drop it"""
+    conn.execute("""
+        INSERT INTO market_prices
+        (state, district, commodity, modal_price, min_price, max_price, variety, grade, market_date, cached_at)
+        SELECT state, district, commodity, modal_price, min_price, max_price,
+               variety, grade, market_date, cached_at
+        FROM (
+            SELECT state, district, commodity, modal_price, min_price, max_price,
+                   IFNULL(variety, '') AS variety, grade, IFNULL(market_date, '') AS market_date, cached_at,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY state, district, commodity, IFNULL(variety, ''), IFNULL(market_date, '')
+                       ORDER BY cached_at DESC, id DESC
+                   ) AS row_rank
+            FROM market_prices_legacy
+        )
+        WHERE row_rank = 1
+    """)
+    conn.execute("DROP TABLE market_prices_legacy")
+
+
+def _compact_chat_messages(conn):
+    """Drop the duplicated chat_data JSON and compress long assistant responses"""
+    # The search index now reads decompressed text through a view; chat_text()
+    # only exists on connections that are upgrading through this migration
+    register_functions(conn)
+    _execute_script(conn, """
+        DROP TRIGGER IF EXISTS chat_messages_fts_insert;
+        DROP TRIGGER IF EXISTS chat_messages_fts_delete;
+        DROP TRIGGER IF EXISTS chat_messages_fts_update;
+        DROP TABLE IF EXISTS chat_messages_fts;
+    """)
+
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(chat_messages)")]
+    if "chat_data" in columns:
+        conn.execute("ALTER TABLE chat_messages DROP COLUMN chat_data")
+
+    rows = conn.execute(
+        "SELECT id, assistant_response FROM chat_messages WHERE typeof(assistant_response) = 'text'"
+        " AND length(CAST(assistant_response AS BLOB)) >= ?",
+        (DEFAULT_COMPRESS_MIN_BYTES,)
+    ).fetchall()
+    conn.executemany(
+        "UPDATE chat_messages SET assistant_response = ? WHERE id = ?",
+        [(compress_text(row[1]), row[0]) for row in rows]
+    )
+
+    _execute_script(conn, """
+        CREATE VIEW IF NOT EXISTS chat_messages_text AS
+            SELECT id, user_message, chat_text(assistant_response) AS assistant_response
+            FROM chat_messages;
+        CREATE VIRTUAL TABLE chat_messages_fts USING fts5(
+            user_message,
+            assistant_response,
+            content='chat_messages_text',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER chat_messages_fts_insert AFTER INSERT ON chat_messages BEGIN
+            INSERT INTO chat_messages_fts (rowid, user_message, assistant_response)
+            VALUES (new.id, new.user_message, chat_text(new.assistant_response));
+        END;
+        CREATE TRIGGER chat_messages_fts_delete AFTER DELETE ON chat_messages BEGIN
+            INSERT INTO chat_messages_fts (chat_messages_fts, rowid, user_message, assistant_response)
+            VALUES ('delete', old.id, old.user_message, chat_text(old.assistant_response));
+        END;
+        CREATE TRIGGER chat_messages_fts_update AFTER UPDATE ON chat_messages BEGIN
+            INSERT INTO chat_messages_fts (chat_messages_fts, rowid, user_message, assistant_response)
+            VALUES ('delete', old.id, old.user_message, chat_text(old.assistant_response));
+            INSERT INTO chat_messages_fts (rowid, user_message, assistant_response)
+            VALUES (new.id, new.user_message, chat_text(new.assistant_response));
+        END;
+        INSERT INTO chat_messages_fts (chat_messages_fts) VALUES ('rebuild');
+    """)
+
+
+def _plain_chat_search_index(conn):
+    """Rebuild the search index as a standalone FTS table filled from Python"""
+    # The migration 4 triggers call chat_text(), which only exists on
+    # DatabaseManager connections; any other client failed to change chat_messages.
+    # New messages are indexed by SessionManager, removals by plain SQL triggers.
+    _execute_script(conn, """
+        DROP TRIGGER IF EXISTS chat_messages_fts_insert;
+        DROP TRIGGER IF EXISTS chat_messages_fts_delete;
+        DROP TRIGGER IF EXISTS chat_messages_fts_update;
+        DROP TABLE IF EXISTS chat_messages_fts;
+        DROP VIEW IF EXISTS chat_messages_text;
+        CREATE VIRTUAL TABLE chat_messages_fts USING fts5(
+            user_message,
+            assistant_response,
+            tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER chat_messages_fts_delete AFTER DELETE ON chat_messages BEGIN
+            DELETE FROM chat_messages_fts WHERE rowid = old.id;
+        END;
+        CREATE TRIGGER chat_messages_fts_update AFTER UPDATE ON chat_messages BEGIN
+            DELETE FROM chat_messages_fts WHERE rowid = old.id;
+            INSERT INTO chat_messages_fts (rowid, user_message, assistant_response)
+            SELECT new.id, new.user_message, new.assistant_response
+            WHERE typeof(new.assistant_response) = 'text';
+        END;
+    """)
+
+    rows = conn.execute("SELECT id, user_message, assistant_response FROM chat_messages")
+    conn.executemany(
+        "INSERT INTO chat_messages_fts (rowid, user_message, assistant_response) VALUES (?, ?, ?)",
+        ((row[0], row[1], decompress_text(row[2])) for row in rows)
+    )
+
+
+def _contentless_chat_search_index(conn):
+    """Keep only the inverted index for chat search, not a second copy of every message"""
+    # SQLite before 3.43 has no contentless_delete, so nothing here can be
+    # removed by a plain SQL trigger: SessionManager and ChatArchive send the
+    # FTS 'delete' command with the text they indexed. Rows left behind by
+    # other clients are dropped by the join on chat_messages in search(),
+    # and AUTOINCREMENT ids are never reused.
+    _execute_script(conn, """
+        DROP TRIGGER IF EXISTS chat_messages_fts_delete;
+        DROP TRIGGER IF EXISTS chat_messages_fts_update;
+        DROP TABLE IF EXISTS chat_messages_fts;
+        CREATE VIRTUAL TABLE chat_messages_fts USING fts5(
+            user_message,
+            assistant_response,
+            content='',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+    """)
+
+    rows = conn.execute("SELECT id, user_message, assistant_response FROM chat_messages")
+    conn.executemany(
+        "INSERT INTO chat_messages_fts (rowid, user_message, assistant_response) VALUES (?, ?, ?)",
+        ((row[0], row[1], decompress_text(row[2])) for row in rows)
+    )
+
+
+# (version, description, SQL script or callable taking a connection)
+MIGRATIONS: List[Tuple[int, str, Union[str, Callable]]] = [
+    (1, "initial schema", _initial_schema),
+    (2, "index chat sessions by recency", """
+        CREATE INDEX IF NOT EXISTS idx_chat_sessions_recent
+            ON chat_sessions(last_updated DESC, session_id DESC);
+    """),
+    (3, "full-text search over chat messages", """
+        CREATE VIRTUAL TABLE IF NOT EXISTS chat_messages_fts USING fts5(
+            user_message,
+            assistant_response,
+            content='chat_messages',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS chat_messages_fts_insert AFTER INSERT ON chat_messages BEGIN
+            INSERT INTO chat_messages_fts (rowid, user_message, assistant_response)
+            VALUES (new.id, new.user_message, new.assistant_response);
+        END;
+        CREATE TRIGGER IF NOT EXISTS chat_messages_fts_delete AFTER DELETE ON chat_messages BEGIN
+            INSERT INTO chat_messages_fts (chat_messages_fts, rowid, user_message, assistant_response)
+            VALUES ('delete', old.id, old.user_message, old.assistant_response);
+        END;
+        CREATE TRIGGER IF NOT EXISTS chat_messages_fts_update AFTER UPDATE ON chat_messages BEGIN
+            INSERT INTO chat_messages_fts (chat_messages_fts, rowid, user_message, assistant_response)
+            VALUES ('delete', old.id, old.user_message, old.assistant_response);
+            INSERT INTO chat_messages_fts (rowid, user_message, assistant_response)
+            VALUES (new.id, new.user_message, new.assistant_response);
+        END;
+        INSERT INTO chat_messages_fts (chat_messages_fts) VALUES ('rebuild');
+    """),
+    (4, "compact chat message storage", _compact_chat_messages),
+    (5, "archived session index", """
+        CREATE TABLE IF NOT EXISTS archived_sessions (
+            session_id TEXT PRIMARY KEY,
+            segment TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            created_at TIMESTAMP,
+            last_updated TIMESTAMP,
+            first_message TEXT,
+            message_count INTEGER,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (6, "supervisor routing cache", """
+        CREATE TABLE IF NOT EXISTS routing_cache (
+            cache_key TEXT PRIMARY KEY,
+            analysis TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            hits INTEGER DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_routing_cache_last_used ON routing_cache(last_used_at DESC);
+    """),
+    (7, "rolling conversation summaries", """
+        CREATE TABLE IF NOT EXISTS session_summaries (
+            session_id TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            turns_covered INTEGER DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (8, "chat search index without SQL functions", _plain_chat_search_index),
+    (9, "ISO market dates and latest-price indexes", """
+        UPDATE OR REPLACE market_prices
+        SET market_date = substr(market_date, 7, 4) || '-' || substr(market_date, 4, 2) || '-' || substr(market_date, 1, 2)
+        WHERE market_date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]';
+        UPDATE price_sync_state
+        SET last_arrival_date = substr(last_arrival_date, 7, 4) || '-' || substr(last_arrival_date, 4, 2)
+                                || '-' || substr(last_arrival_date, 1, 2)
+        WHERE last_arrival_date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]';
+        DROP INDEX IF EXISTS idx_market_prices_latest;
+        DROP INDEX IF EXISTS idx_market_prices_state;
+        CREATE INDEX idx_market_prices_latest
+            ON market_prices(state, district, commodity, market_date DESC, cached_at DESC);
+        CREATE INDEX idx_market_prices_state
+            ON market_prices(state, commodity, market_date DESC, cached_at DESC);
+    """),
+    (10, "contentless chat search index", _contentless_chat_search_index),
+]
+
+
+def get_schema_version(conn) -> int:
+    """Return the highest applied migration version (0 for a new database)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def run_migrations(conn) -> int:
+    """Apply pending migrations in one transaction and return how many ran"""
+    latest = MIGRATIONS[-1][0]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        current = get_schema_version(conn)
+        applied = 0
+        for version, description, migration in MIGRATIONS:
+            if version <= current:
+                continue
+            if callable(migration):
+                migration(conn)
+            else:
+                _execute_script(conn, migration)
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+            applied += 1
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+    if applied:
+        print(f"Database migrated from version {current} to {latest}")
+    return applied
+
+
+def ensure_migrated(db_path: str, connect: Callable) -> bool:
+    """
+    Bring a database file up to date once per process.
+
+    Returns False without touching the database when this process already
+    migrated it, or when it is already at the latest version.
+    """
+    key = os.path.abspath(db_path)
+    with _migrated_lock:
+        if key in _migrated_paths:
+            return False
+
+        conn = connect()
+        try:
+            latest = MIGRATIONS[-1][0]
+            if _read_version(conn) >= latest:
+                applied = 0
+            else:
+                applied = run_migrations(conn)
+        finally:
+            conn.close()
+
+        _migrated_paths.add(key)
+        return applied > 0
+
+
+def _read_version(conn) -> int:
+    """Read the schema version without creating anything (warm-start check)"""
+    has_table = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if not has_table:
+        return 0
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
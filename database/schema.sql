@@ -1,4 +1,7 @@
--- Market prices cache
+-- Baseline schema (migration version 1).
+-- Later schema changes are added as new migrations in database/migrations.py.
+
+-- Market prices cache (one row per state, district, commodity, variety and market date)
 CREATE TABLE IF NOT EXISTS market_prices (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     state TEXT NOT NULL,
@@ -7,12 +10,29 @@ CREATE TABLE IF NOT EXISTS market_prices (
     modal_price REAL,
     min_price REAL,
     max_price REAL,
-    variety TEXT,
+    variety TEXT NOT NULL DEFAULT '',
     grade TEXT,
-    market_date DATE,
+    market_date DATE NOT NULL DEFAULT '',
     cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Negative cache: lookups that data.gov.in answered with no records
+CREATE TABLE IF NOT EXISTS price_misses (
+    state TEXT NOT NULL,
+    district TEXT NOT NULL,
+    commodity TEXT NOT NULL,
+    missed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (state, district, commodity)
+);
+
+-- Bulk ingestion bookkeeping (one row per state)
+CREATE TABLE IF NOT EXISTS price_sync_state (
+    state TEXT PRIMARY KEY,
+    last_arrival_date DATE,
+    record_count INTEGER DEFAULT 0,
+    synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Location validation cache
 CREATE TABLE IF NOT EXISTS districts (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -43,6 +63,8 @@ CREATE TABLE IF NOT EXISTS chat_messages (
 );
 
 -- Indexes for performance
-CREATE INDEX IF NOT EXISTS idx_market_prices_lookup ON market_prices(state, district, commodity, market_date);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_market_prices_key ON market_prices(state, district, commodity, variety, market_date);
+CREATE INDEX IF NOT EXISTS idx_market_prices_latest ON market_prices(state, district, commodity, cached_at DESC);
+CREATE INDEX IF NOT EXISTS idx_market_prices_state ON market_prices(state, commodity, cached_at DESC);
 CREATE INDEX IF NOT EXISTS idx_districts_lookup ON districts(state, district);
 CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages(session_id);
@@ -1,62 +1,87 @@
-import json
+import re
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+import config
+from database.archive import ChatArchive
 from database.db_manager import DatabaseManager
+from database.text_codec import compress_text, decompress_text
 
 class SessionManager:
     """Manages chat sessions and history"""
     
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, archive: ChatArchive = None):
         self.db = db_manager
+        self.archive = archive or ChatArchive(db_manager)
     
     def generate_session_id(self) -> str:
         """Generate unique session ID based on timestamp with milliseconds"""
         return datetime.now().strftime("%Y%m%d%H%M%S%f")
     
     def store_chat_history(self, session_id: str, user_message: str, assistant_response: str) -> None:
-        """Store chat interaction with JSON format"""
-        conn = self.db.get_connection()
-        try:
-            # Check if session exists
+        """Store chat interaction (queued when write-behind is enabled)"""
+        # Taken now so a queued write keeps the time the turn actually happened
+        created_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        stored_response = compress_text(assistant_response, config.CHAT_COMPRESS_MIN_BYTES)
+        
+        def write(conn):
             cursor = conn.cursor()
-            cursor.execute("SELECT session_id FROM chat_sessions WHERE session_id = ?", (session_id,))
-            session_exists = cursor.fetchone()
-            
-            if not session_exists:
-                # Create new session
-                cursor.execute(
-                    """INSERT INTO chat_sessions (session_id, first_message, message_count)
-                       VALUES (?, ?, 1)""",
-                    (session_id, user_message)
-                )
-            else:
-                # Update existing session
-                cursor.execute(
-                    """UPDATE chat_sessions 
-                       SET last_updated = CURRENT_TIMESTAMP,
-                           message_count = message_count + 1
-                       WHERE session_id = ?""",
-                    (session_id,)
-                )
+            # A message for an archived session brings the whole session back first
+            cursor.execute("SELECT 1 FROM chat_sessions WHERE session_id = ?", (session_id,))
+            if cursor.fetchone() is None:
+                archived = self.archive.unarchive_session(conn, session_id)
+                if archived:
+                    self._restore_archived(cursor, archived)
             
-            # Store message with JSON format
-            chat_data = json.dumps({
-                "user": user_message,
-                "assistant": assistant_response
-            })
+            # Create the session on its first message, otherwise bump its counters
+            cursor.execute(
+                """INSERT INTO chat_sessions (session_id, created_at, last_updated, first_message, message_count)
+                   VALUES (?, ?, ?, ?, 1)
+                   ON CONFLICT (session_id) DO UPDATE SET
+                       last_updated = excluded.last_updated,
+                       message_count = message_count + 1""",
+                (session_id, created_at, created_at, user_message)
+            )
             
+            # Long responses are stored compressed; the contentless search index
+            # keeps only the tokens of the plain text
             cursor.execute(
-                """INSERT INTO chat_messages (session_id, user_message, assistant_response, chat_data)
+                """INSERT INTO chat_messages (session_id, user_message, assistant_response, created_at)
                    VALUES (?, ?, ?, ?)""",
-                (session_id, user_message, assistant_response, chat_data)
+                (session_id, user_message, stored_response, created_at)
+            )
+            cursor.execute(
+                """INSERT INTO chat_messages_fts (rowid, user_message, assistant_response)
+                   VALUES (?, ?, ?)""",
+                (cursor.lastrowid, user_message, assistant_response)
+            )
+        
+        self.db.submit_write(write)
+    
+    def _restore_archived(self, cursor, archived: Dict):
+        """Insert an archived session and its messages back, keeping their ids"""
+        summary = archived["session"]
+        cursor.execute(
+            """INSERT INTO chat_sessions (session_id, created_at, last_updated, first_message, message_count)
+               VALUES (?, ?, ?, ?, ?)""",
+            (summary["session_id"], summary["created_at"], summary["last_updated"],
+             summary["first_message"], summary["message_count"])
+        )
+        for message in archived["messages"]:
+            cursor.execute(
+                """INSERT INTO chat_messages (id, session_id, user_message, assistant_response, created_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (message["id"], summary["session_id"], message["user"],
+                 compress_text(message["assistant"], config.CHAT_COMPRESS_MIN_BYTES), message["timestamp"])
+            )
+            cursor.execute(
+                """INSERT INTO chat_messages_fts (rowid, user_message, assistant_response)
+                   VALUES (?, ?, ?)""",
+                (message["id"], message["user"], message["assistant"])
             )
-            
-            conn.commit()
-        finally:
-            conn.close()
     
     def retrieve_chat_history(self, session_id: str) -> List[Dict[str, str]]:
-        """Retrieve all messages for a session"""
+        """Retrieve all messages for a session, reading archived sessions from their segment"""
+        self.db.flush_writes()
         query = """
             SELECT user_message, assistant_response, created_at
             FROM chat_messages
@@ -64,33 +89,96 @@ class SessionManager:
             ORDER BY created_at ASC
         """
         
-        conn = self.db.get_connection()
-        try:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, (session_id,))
             rows = cursor.fetchall()
-            
-            return [
-                {
-                    "user": row[0],
-                    "assistant": row[1],
-                    "timestamp": row[2]
+        
+        if not rows:
+            archived = self.archive.load_session(session_id)
+            if archived:
+                return [
+                    {
+                        "user": message["user"],
+                        "assistant": message["assistant"],
+                        "timestamp": message["timestamp"]
+                    }
+                    for message in archived["messages"]
+                ]
+        
+        return [
+            {
+                "user": row[0],
+                "assistant": decompress_text(row[1]),
+                "timestamp": row[2]
+            }
+            for row in rows
+        ]
+    
+    def retrieve_chat_window(self, session_id: str, limit: int = 20, before_id: Optional[int] = None) -> Dict[str, any]:
+        """
+        Retrieve the latest `limit` messages of a session, oldest first.
+
+        Pass the id of the oldest message already shown as `before_id` to fetch
+        the page before it. Returns the messages (each with its "id"), the
+        session's total message count and whether earlier messages remain.
+        """
+        self.db.flush_writes()
+        query = """
+            SELECT id, user_message, assistant_response, created_at
+            FROM chat_messages
+            WHERE session_id = ? AND id < ?
+            ORDER BY id DESC
+            LIMIT ?
+        """
+        
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            # Without before_id, any real id qualifies
+            cursor.execute(query, (session_id, before_id if before_id is not None else 2 ** 63 - 1, limit + 1))
+            rows = cursor.fetchall()
+            cursor.execute("SELECT message_count FROM chat_sessions WHERE session_id = ?", (session_id,))
+            count_row = cursor.fetchone()
+        
+        if count_row is None:
+            archived = self.archive.load_session(session_id)
+            if archived:
+                # Archived messages keep their ids, so paging works the same way
+                earlier = [
+                    message for message in archived["messages"]
+                    if before_id is None or message["id"] < before_id
+                ]
+                return {
+                    "messages": earlier[-limit:] if limit > 0 else [],
+                    "total": len(archived["messages"]),
+                    "has_more": len(earlier) > limit
                 }
-                for row in rows
-            ]
-        finally:
-            conn.close()
+        
+        messages = [
+            {
+                "id": row[0],
+                "user": row[1],
+                "assistant": decompress_text(row[2]),
+                "timestamp": row[3]
+            }
+            for row in reversed(rows[:limit])
+        ]
+        return {
+            "messages": messages,
+            "total": count_row[0] if count_row else len(messages),
+            "has_more": len(rows) > limit
+        }
     
     def get_all_sessions(self) -> List[Dict[str, any]]:
         """Get all chat sessions with summary info"""
+        self.db.flush_writes()
         query = """
             SELECT session_id, created_at, last_updated, first_message, message_count
             FROM chat_sessions
             ORDER BY last_updated DESC
         """
         
-        conn = self.db.get_connection()
-        try:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query)
             rows = cursor.fetchall()
@@ -105,19 +193,113 @@ class SessionManager:
                 }
                 for row in rows
             ]
-        finally:
-            conn.close()
+    
+    def list_sessions(self, limit: int = 10, before: Optional[Tuple[str, str]] = None) -> Tuple[List[Dict[str, any]], Optional[Tuple[str, str]]]:
+        """
+        Get one page of sessions, most recently updated first.
+
+        Pages are keyed on (last_updated, session_id) rather than an offset, so
+        every page is a single index range scan however many sessions exist.
+        Pass the returned cursor as `before` to get the next page; it is None
+        when there are no more sessions.
+        """
+        self.db.flush_writes()
+        columns = "session_id, created_at, last_updated, first_message, message_count"
+        if before is None:
+            query = f"""
+                SELECT {columns}
+                FROM chat_sessions
+                ORDER BY last_updated DESC, session_id DESC
+                LIMIT ?
+            """
+            params = (limit + 1,)
+        else:
+            query = f"""
+                SELECT {columns}
+                FROM chat_sessions
+                WHERE (last_updated, session_id) < (?, ?)
+                ORDER BY last_updated DESC, session_id DESC
+                LIMIT ?
+            """
+            params = (before[0], before[1], limit + 1)
+        
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        
+        # The extra row only tells us whether another page exists
+        has_more = len(rows) > limit
+        sessions = [
+            {
+                "session_id": row[0],
+                "created_at": row[1],
+                "last_updated": row[2],
+                "first_message": row[3],
+                "message_count": row[4]
+            }
+            for row in rows[:limit]
+        ]
+        next_cursor = (sessions[-1]["last_updated"], sessions[-1]["session_id"]) if has_more else None
+        return sessions, next_cursor
+    
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, any]]:
+        """
+        Find sessions whose messages match the query, best matches first.
+
+        Every word of the query must appear in a message; words match as
+        prefixes, so "nash" finds "Nashik". Sessions are ranked by their
+        best-matching message and report how many messages matched.
+        """
+        terms = re.findall(r"\w+", query)
+        if not terms:
+            return []
+        # Quote each word so user input is never parsed as FTS syntax
+        match = " ".join(f'"{term}"*' for term in terms)
+        
+        self.db.flush_writes()
+        sql = """
+            SELECT s.session_id, s.created_at, s.last_updated, s.first_message, s.message_count,
+                   hits.matches
+            FROM (
+                SELECT m.session_id, MIN(f.rank) AS best_rank, COUNT(*) AS matches
+                FROM chat_messages_fts f
+                JOIN chat_messages m ON m.id = f.rowid
+                WHERE chat_messages_fts MATCH ?
+                GROUP BY m.session_id
+            ) hits
+            JOIN chat_sessions s ON s.session_id = hits.session_id
+            ORDER BY hits.best_rank, s.last_updated DESC
+            LIMIT ?
+        """
+        
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, (match, limit))
+            rows = cursor.fetchall()
+            
+            return [
+                {
+                    "session_id": row[0],
+                    "created_at": row[1],
+                    "last_updated": row[2],
+                    "first_message": row[3],
+                    "message_count": row[4],
+                    "matches": row[5]
+                }
+                for row in rows
+            ]
     
     def get_session_summary(self, session_id: str) -> Optional[Dict[str, any]]:
         """Get summary info for a specific session"""
+        self.db.flush_writes()
         query = """
             SELECT session_id, created_at, last_updated, first_message, message_count
             FROM chat_sessions
             WHERE session_id = ?
         """
         
-        conn = self.db.get_connection()
-        try:
+        with self.db.connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, (session_id,))
             row = cursor.fetchone()
@@ -131,5 +313,3 @@ class SessionManager:
                     "message_count": row[4]
                 }
             return None
-        finally:
-            conn.close()
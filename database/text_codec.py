@@ -0,0 +1,33 @@
+import zlib
+from typing import Union
+
+# Long assistant responses are stored zlib-compressed as BLOBs; short ones and
+# all user messages stay plain TEXT. Readers tell the two apart by type.
+DEFAULT_COMPRESS_MIN_BYTES = 1024
+COMPRESSION_LEVEL = 6
+
+
+def compress_text(text: str, min_bytes: int = DEFAULT_COMPRESS_MIN_BYTES) -> Union[str, bytes]:
+    """Return the zlib-compressed bytes for long text, or the text itself"""
+    if min_bytes <= 0:
+        return text
+    raw = text.encode("utf-8")
+    if len(raw) < min_bytes:
+        return text
+    packed = zlib.compress(raw, COMPRESSION_LEVEL)
+    # Keep incompressible text readable as-is
+    return packed if len(packed) < len(raw) else text
+
+
+def decompress_text(value: Union[str, bytes, None]) -> str:
+    """Inverse of compress_text; plain text passes through unchanged"""
+    if value is None:
+        return ""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return zlib.decompress(bytes(value)).decode("utf-8")
+    return value
+
+
+def register_functions(conn):
+    """Expose chat_text(value) to SQL for migrations that read stored messages"""
+    conn.create_function("chat_text", 1, decompress_text, deterministic=True)
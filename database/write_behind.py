@@ -0,0 +1,156 @@
+import atexit
+import queue
+import threading
+import time
+from typing import Callable, Dict, List
+
+
+class WriteBehindQueue:
+    """
+    Batches database writes and applies them on a background thread.
+
+    Each write is a callable taking a connection. Writes are grouped into a
+    single transaction per batch. When the queue is full, or after close(),
+    writes are applied synchronously by the caller so nothing is dropped.
+    """
+
+    SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL")
+
+    def __init__(self, connect: Callable, max_queue: int = 1000, batch_size: int = 100,
+                 flush_interval: float = 0.2, synchronous: str = "NORMAL"):
+        if synchronous.upper() not in self.SYNCHRONOUS_MODES:
+            raise ValueError(f"Unsupported synchronous mode: {synchronous}")
+
+        self._connect = connect
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous.upper()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._state_lock = threading.Lock()  # Orders submits against close()
+        self._write_lock = threading.Lock()  # Serialises the writer with synchronous fallbacks
+        self._conn = None
+        self._batches = 0
+        self._writes = 0
+        self._sync_fallbacks = 0
+        self._failures = 0
+
+        self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, write: Callable):
+        """Queue a write, applying it immediately if the queue is full or closed"""
+        with self._state_lock:
+            # Checked under the lock so no write can be queued behind the close sentinel
+            if not self._closed:
+                try:
+                    self._queue.put_nowait(write)
+                    return
+                except queue.Full:
+                    pass
+
+        self._sync_fallbacks += 1
+        self._apply([write])
+
+    def pending(self) -> int:
+        """Number of queued writes not yet applied"""
+        return self._queue.unfinished_tasks
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued write is applied; returns False on timeout"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline or not self._thread.is_alive():
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout: float = 10.0):
+        """Flush outstanding writes and stop the background thread"""
+        if self._closed:
+            return
+        self.flush(timeout)
+        with self._state_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)  # Wake the writer so it can exit
+        self._thread.join(timeout)
+
+    def get_stats(self) -> Dict:
+        """Return queue depth and batching counters"""
+        return {
+            "pending": self.pending(),
+            "batches": self._batches,
+            "writes": self._writes,
+            "sync_fallbacks": self._sync_fallbacks,
+            "failures": self._failures
+        }
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._queue.task_done()
+                break
+
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.task_done()
+                    self._closed = True
+                    break
+                batch.append(item)
+
+            try:
+                self._apply(batch)
+                self._batches += 1
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if self._closed and self._queue.empty():
+                break
+
+        with self._write_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _apply(self, writes: List[Callable]):
+        """Apply writes in one transaction, retrying them one by one if the batch fails"""
+        with self._write_lock:
+            if self._conn is None:
+                self._conn = self._connect()
+                self._conn.execute(f"PRAGMA synchronous={self.synchronous}")
+
+            try:
+                self._run_transaction(writes)
+            except Exception as e:
+                print(f"Write-behind batch failed, retrying writes individually: {e}")
+                for write in writes:
+                    try:
+                        self._run_transaction([write])
+                    except Exception as write_error:
+                        self._failures += 1
+                        print(f"Write-behind write dropped: {write_error}")
+
+    def _run_transaction(self, writes: List[Callable]):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for write in writes:
+                write(self._conn)
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+        self._writes += len(writes)
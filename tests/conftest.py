@@ -0,0 +1,27 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Tests run from a checkout without installing the app
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# config.py refuses to load without a key; nothing under test calls OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+# tools.price_tools opens config.DATABASE_PATH at import; keep it out of the checkout
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "mandi_saathi.db"))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "mandi_saathi_test.db")
+
+
+@pytest.fixture
+def db_manager(db_path):
+    from database.db_manager import DatabaseManager
+
+    manager = DatabaseManager(db_path)
+    yield manager
+    manager.close()
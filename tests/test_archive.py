@@ -0,0 +1,51 @@
+import pytest
+
+from database.archive import ChatArchive
+from database.session_manager import SessionManager
+
+LONG_RESPONSE = "Nashik mandi mein pyaz ka bhav Rs 1800 per quintal hai. " * 40
+
+
+@pytest.fixture
+def session_manager(db_manager, tmp_path):
+    archive = ChatArchive(db_manager, archive_dir=str(tmp_path / "archive"), batch_size=1)
+    return SessionManager(db_manager, archive)
+
+
+def _make_idle(db_manager, session_id):
+    with db_manager.transaction() as conn:
+        conn.execute("UPDATE chat_sessions SET last_updated = '2020-01-01 00:00:00' WHERE session_id = ?",
+                     (session_id,))
+
+
+def test_idle_sessions_are_moved_out_and_still_readable(db_manager, session_manager):
+    session_manager.store_chat_history("old", "pyaz ka bhav Nashik", LONG_RESPONSE)
+    session_manager.store_chat_history("old", "trader 1500 de raha hai", "Thoda ruk jaiye")
+    session_manager.store_chat_history("new", "tamatar Ballia", "Rs 1200/quintal")
+    db_manager.flush_writes()
+    _make_idle(db_manager, "old")
+
+    result = session_manager.archive.archive_idle_sessions(days=30)
+
+    assert (result["sessions"], result["messages"]) == (1, 2)
+    rows = db_manager.execute_query("SELECT DISTINCT session_id FROM chat_messages")
+    assert [row[0] for row in rows] == ["new"]
+    history = session_manager.retrieve_chat_history("old")
+    assert [turn["assistant"] for turn in history] == [LONG_RESPONSE, "Thoda ruk jaiye"]
+    # Archived messages leave the search index
+    assert session_manager.search("pyaz") == []
+
+
+def test_new_message_restores_an_archived_session(db_manager, session_manager):
+    session_manager.store_chat_history("old", "pyaz ka bhav Nashik", LONG_RESPONSE)
+    db_manager.flush_writes()
+    _make_idle(db_manager, "old")
+    session_manager.archive.archive_idle_sessions(days=30)
+
+    session_manager.store_chat_history("old", "aur Pune mein?", "Pune mein Rs 1900/quintal")
+
+    history = session_manager.retrieve_chat_history("old")
+    assert [turn["user"] for turn in history] == ["pyaz ka bhav Nashik", "aur Pune mein?"]
+    assert session_manager.get_session_summary("old")["message_count"] == 2
+    assert [hit["session_id"] for hit in session_manager.search("pyaz")] == ["old"]
+    assert db_manager.execute_query("SELECT COUNT(*) FROM archived_sessions")[0][0] == 0
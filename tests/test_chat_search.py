@@ -0,0 +1,43 @@
+from database.session_manager import SessionManager
+
+
+def _session_ids(hits):
+    return [hit["session_id"] for hit in hits]
+
+
+def _store(db_manager, turns):
+    session_manager = SessionManager(db_manager)
+    for session_id, user_message, assistant_response in turns:
+        session_manager.store_chat_history(session_id, user_message, assistant_response)
+    return session_manager
+
+
+def test_words_match_as_prefixes_and_all_must_appear(db_manager):
+    session_manager = _store(db_manager, [
+        ("s1", "pyaz ka bhav Nashik", "Nashik mein pyaz Rs 1800/quintal"),
+        ("s2", "tamatar ka bhav Nashik", "Nashik mein tamatar Rs 1200/quintal"),
+    ])
+
+    assert set(_session_ids(session_manager.search("nash"))) == {"s1", "s2"}
+    assert _session_ids(session_manager.search("pyaz nash")) == ["s1"]
+    assert session_manager.search("pyaz Ballia") == []
+
+
+def test_sessions_report_matching_messages(db_manager):
+    session_manager = _store(db_manager, [
+        ("s1", "gehun ka bhav Ballia", "Ballia mein gehun Rs 2400/quintal"),
+        ("s1", "trader 2200 de raha hai gehun ke", "Thoda ruk jaiye"),
+        ("s2", "aloo Agra", "Agra mein aloo Rs 900/quintal"),
+    ])
+
+    hits = session_manager.search("gehun")
+
+    assert _session_ids(hits) == ["s1"]
+    assert hits[0]["matches"] == 2
+
+
+def test_fts_syntax_in_queries_is_treated_as_text(db_manager):
+    session_manager = _store(db_manager, [("s1", "pyaz OR tamatar?", "Dono ka bhav bata deta hoon")])
+
+    assert _session_ids(session_manager.search('pyaz" OR (tamatar')) == ["s1"]
+    assert session_manager.search("*?!") == []
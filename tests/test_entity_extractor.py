@@ -0,0 +1,39 @@
+import pytest
+
+from tools.entity_extractor import get_entity_extractor
+
+
+@pytest.mark.parametrize("message, offered_price, quantity, confident", [
+    ("trader 1500 bol raha hai, tamatar Ballia", 1500, None, True),
+    ("tamatar Ballia, rs 1800 offer hai", 1800, None, True),
+    ("trader 1500 bol raha hai, 50 quintal gehu Ballia", 1500, "50 quintal", True),
+    # Per-kg prices are converted to per quintal
+    ("tamatar Ballia, trader 20 rs kilo de raha hai", 2000, None, True),
+    ("₹20/kg pyaz Nashik", 2000, None, True),
+    # Numbers counting time or goods are not offers
+    ("rs 1800 offer, 2 ghante se wait, tamatar Ballia", 1800, None, True),
+    ("aloo Agra 20 kilo ka rate", None, "20 kg", True),
+    # Two different amounts: the LLM decides which one is the offer
+    ("trader ne 2 din pehle 1200 bola, aaj 1500 de raha hai, tamatar Ballia", None, None, False),
+    ("trader 1500 bol raha, mujhe 1800 chahiye, tamatar Ballia", None, None, False),
+])
+def test_offer_extraction(message, offered_price, quantity, confident):
+    entities = get_entity_extractor().extract(message)
+
+    assert entities["offered_price"] == offered_price
+    assert entities["quantity"] == quantity
+    assert entities["confident"] is confident
+
+
+@pytest.mark.parametrize("message, commodity, district, confident", [
+    ("tamaatar ka bhav Ballia", "Tomato", "Ballia", True),
+    ("pyaz Nashik UP", "Onion", "Nashik", False),
+    ("aloo aur pyaz Agra", None, "Agra", False),
+    ("up se hoon, tamatar ka rate", "Tomato", None, False),
+])
+def test_commodity_and_location(message, commodity, district, confident):
+    entities = get_entity_extractor().extract(message)
+
+    assert entities["commodity"] == commodity
+    assert entities["district"] == district
+    assert entities["confident"] is confident
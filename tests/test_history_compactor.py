@@ -0,0 +1,57 @@
+from agents.history_compactor import HistoryCompactor, estimate_tokens
+
+TURNS = [
+    {"user": "pyaz ka bhav Nashik", "assistant": "Nashik mein pyaz ₹1,800 per quintal hai. Mandi subah jaldi jaiye."},
+    {"user": "trader 1500 bol raha hai", "assistant": "Rs 1500 kam hai. ₹1,700 se neeche mat bechiye."},
+    {"user": "aur Pune mein?", "assistant": "Pune mein ₹1,900 chal raha hai."},
+    {"user": "theek hai", "assistant": "Koi aur madad chahiye to bataiye."},
+]
+
+
+def test_short_history_is_kept_verbatim():
+    compactor = HistoryCompactor(keep_turns=4)
+
+    assert compactor.compact(TURNS) == compactor.format_verbatim(TURNS)
+    assert compactor.compact([]) == ""
+
+
+def test_older_turns_are_summarised():
+    text = HistoryCompactor(keep_turns=1).compact(TURNS)
+
+    summary, verbatim = text.split("\n", 1)
+    assert summary.startswith("Summary of earlier conversation: 3 earlier turns")
+    assert "Commodity: Onion" in summary
+    # The latest location wins; only the most recent prices are listed
+    assert "Location: Pune, Maharashtra" in summary
+    assert "Trader offers: ₹1500 |" in summary
+    assert "Prices quoted: ₹1500, ₹1700, ₹1900 |" in summary
+    assert verbatim == "Farmer: theek hai\nAssistant: Koi aur madad chahiye to bataiye."
+
+
+def test_ambiguous_offers_are_left_out_of_the_summary():
+    turns = [{"user": "trader ne 2 din pehle 1200 bola, aaj 1500 de raha hai", "assistant": "Ruk jaiye."}] + TURNS[3:]
+
+    text = HistoryCompactor(keep_turns=1).compact(turns)
+
+    assert "Trader offers" not in text
+
+
+def test_stored_summary_folds_each_turn_once(db_manager):
+    compactor = HistoryCompactor(db_manager, keep_turns=1)
+    compactor.compact(TURNS[:3], session_id="s1")
+    db_manager.flush_writes()
+
+    text = compactor.compact(TURNS, session_id="s1")
+    db_manager.flush_writes()
+
+    assert "3 earlier turns" in text
+    row = db_manager.execute_query("SELECT turns_covered FROM session_summaries WHERE session_id = 's1'")
+    assert row[0][0] == 3
+
+
+def test_history_is_kept_within_the_token_budget():
+    long_turns = [{"user": "pyaz ka bhav Nashik " * 30, "assistant": "Nashik mein ₹1,800. " * 60}] * 3
+
+    text = HistoryCompactor(keep_turns=3, token_budget=200).compact(long_turns)
+
+    assert estimate_tokens(text) <= 200
@@ -0,0 +1,47 @@
+import pytest
+
+from agents.intent_classifier import IntentPreClassifier
+
+HISTORY = [{"user_message": "tamatar ka bhav Ballia", "assistant_response": "Ballia mein tamatar Rs 1500/quintal"}]
+
+
+def intent(message, chat_history=None):
+    analysis = IntentPreClassifier(enabled=True).classify(message, chat_history)
+    return analysis["intent"] if analysis else None
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("namaste", "GREETING"),
+    ("jai kisan", "GREETING"),
+    ("good morning sir", "GREETING"),
+    ("thank you very much", "GREETING"),
+    ("who are you?", "GENERAL_QUERY"),
+    ("aap kaun ho", "GENERAL_QUERY"),
+    ("hi, how does this work", "GENERAL_QUERY"),
+    ("tamatar ka bhav", "MISSING_INFO"),
+    ("mandi rate batao", "MISSING_INFO"),
+])
+def test_obvious_intents_resolved_locally(message, expected):
+    assert intent(message) == expected
+
+
+@pytest.mark.parametrize("message", [
+    "kisan",
+    "ram",
+    "what is this trader saying, should I sell?",
+    "trader ka offer ye kya hai",
+    "how does this work when trader cheats",
+    "tamatar Ballia 1500",
+    "pyaz ka bhav Lasalgaon",
+])
+def test_ambiguous_messages_go_to_llm(message):
+    assert intent(message) is None
+
+
+@pytest.mark.parametrize("message", ["ok thanks", "ye kya hai", "tamatar ka bhav"])
+def test_history_defers_to_llm(message):
+    assert intent(message, HISTORY) is None
+
+
+def test_disabled_classifier_defers_everything():
+    assert IntentPreClassifier(enabled=False).classify("namaste") is None
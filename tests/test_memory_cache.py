@@ -0,0 +1,92 @@
+import time
+
+from database.cache_manager import CacheManager
+from database.memory_cache import TTLCache
+
+
+def test_entries_expire_after_their_ttl():
+    cache = TTLCache(maxsize=10, default_ttl=60)
+    cache.set("short", 1, ttl=0.05)
+    cache.set("long", 2)
+
+    time.sleep(0.06)
+
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+    assert cache.get_stats()["size"] == 1
+
+
+def test_non_positive_ttl_is_not_stored():
+    cache = TTLCache(maxsize=10, default_ttl=60)
+    cache.set("key", 1, ttl=0)
+
+    assert cache.get("key") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, default_ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now the least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_overwriting_a_key_refreshes_its_recency():
+    cache = TTLCache(maxsize=2, default_ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("a", 10)
+    cache.set("c", 3)
+
+    assert cache.get("a") == 10
+    assert cache.get("b") is None
+
+
+def test_stats_count_hits_and_misses():
+    cache = TTLCache(maxsize=10, default_ttl=60)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("missing")
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def _record(modal_price, price_date):
+    return {
+        "state": "Maharashtra", "district": "Nashik", "commodity": "Onion",
+        "modal_price": modal_price, "min_price": modal_price - 100, "max_price": modal_price + 100,
+        "variety": "Red", "grade": "FAQ", "price_date": price_date
+    }
+
+
+def test_memory_tier_keeps_the_newest_date_of_a_batch(db_manager):
+    cache_manager = CacheManager(db_manager)
+    # API and delta-sync batches arrive newest first
+    cache_manager.upsert_market_prices([_record(2100, "2026-10-18"), _record(1600, "2026-10-17")])
+
+    from_memory = cache_manager.get_cached_price("Maharashtra", "Nashik", "Onion")
+    cache_manager._memory.clear()
+    from_sqlite = cache_manager.get_cached_price("Maharashtra", "Nashik", "Onion")
+
+    assert from_memory["modal_price"] == from_sqlite["modal_price"] == 2100
+    assert from_memory["market_date"] == from_sqlite["market_date"] == "2026-10-18"
+
+
+def test_state_prices_see_new_upserts(db_manager):
+    cache_manager = CacheManager(db_manager)
+    assert cache_manager.get_state_prices("Maharashtra", "Onion") == []
+
+    cache_manager.upsert_market_prices([_record(2100, "2026-10-18")])
+    assert [p["district"] for p in cache_manager.get_state_prices("Maharashtra", "Onion")] == ["Nashik"]
+
+    pune = dict(_record(1900, "2026-10-18"), district="Pune")
+    cache_manager.upsert_market_prices([pune])
+    assert {p["district"] for p in cache_manager.get_state_prices("Maharashtra", "Onion")} == {"Nashik", "Pune"}
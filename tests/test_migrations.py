@@ -0,0 +1,171 @@
+import sqlite3
+
+import pytest
+
+from database import migrations
+from database.db_manager import DatabaseManager
+from database.session_manager import SessionManager
+
+LATEST_VERSION = migrations.MIGRATIONS[-1][0]
+
+# Schema of databases created before versioned migrations existed
+LEGACY_SCHEMA = """
+    CREATE TABLE market_prices (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        state TEXT NOT NULL,
+        district TEXT NOT NULL,
+        commodity TEXT NOT NULL,
+        modal_price REAL,
+        min_price REAL,
+        max_price REAL,
+        variety TEXT,
+        grade TEXT,
+        market_date DATE,
+        cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE districts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        state TEXT NOT NULL,
+        district TEXT NOT NULL,
+        normalized_name TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE chat_sessions (
+        session_id TEXT PRIMARY KEY,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        first_message TEXT,
+        message_count INTEGER DEFAULT 0
+    );
+    CREATE TABLE chat_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        user_message TEXT NOT NULL,
+        assistant_response TEXT NOT NULL,
+        chat_data JSON,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (session_id) REFERENCES chat_sessions(session_id)
+    );
+    CREATE INDEX idx_market_prices_lookup ON market_prices(state, district, commodity, market_date);
+"""
+
+LONG_RESPONSE = "Nashik mandi mein pyaz ka bhav aaj 1800 rupaye quintal hai. " * 40
+
+
+@pytest.fixture
+def legacy_db_path(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany(
+        "INSERT INTO market_prices (state, district, commodity, modal_price, min_price, max_price,"
+        " variety, grade, market_date, cached_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            ("Maharashtra", "Nashik", "Onion", 1500, 1400, 1600, "Red", "FAQ", "17/10/2026", "2026-10-17 08:00:00"),
+            ("Maharashtra", "Nashik", "Onion", 1700, 1600, 1800, "Red", "FAQ", "17/10/2026", "2026-10-17 12:00:00"),
+            ("Maharashtra", "Nashik", "Onion", 1800, 1700, 1900, "Red", "FAQ", "18/10/2026", "2026-10-18 08:00:00"),
+        ]
+    )
+    conn.execute("INSERT INTO chat_sessions (session_id, first_message, message_count) VALUES ('s1', 'pyaz ka bhav', 2)")
+    conn.executemany(
+        "INSERT INTO chat_messages (session_id, user_message, assistant_response, chat_data) VALUES (?, ?, ?, ?)",
+        [
+            ("s1", "pyaz ka bhav Nashik", LONG_RESPONSE, '{"user": "pyaz ka bhav Nashik"}'),
+            ("s1", "trader 1500 de raha hai", "Thoda ruk jaiye", '{"user": "trader 1500 de raha hai"}'),
+        ]
+    )
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def _version(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_new_database_is_created_at_the_latest_version(db_manager, db_path):
+    assert _version(db_path) == LATEST_VERSION
+    tables = {row[0] for row in db_manager.execute_query("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"market_prices", "chat_sessions", "chat_messages", "chat_messages_fts", "archived_sessions",
+            "routing_cache", "session_summaries"} <= tables
+
+
+def test_legacy_database_is_upgraded_in_place(legacy_db_path):
+    db_manager = DatabaseManager(legacy_db_path)
+    try:
+        assert _version(legacy_db_path) == LATEST_VERSION
+
+        prices = db_manager.execute_query(
+            "SELECT market_date, modal_price FROM market_prices ORDER BY market_date"
+        )
+        # The latest row per key survives, with dates stored as yyyy-mm-dd
+        assert [tuple(row) for row in prices] == [("2026-10-17", 1700), ("2026-10-18", 1800)]
+
+        columns = [row[1] for row in db_manager.execute_query("PRAGMA table_info(chat_messages)")]
+        assert "chat_data" not in columns
+
+        session_manager = SessionManager(db_manager)
+        history = session_manager.retrieve_chat_history("s1")
+        assert [turn["assistant"] for turn in history] == [LONG_RESPONSE, "Thoda ruk jaiye"]
+        assert [hit["session_id"] for hit in session_manager.search("quintal")] == ["s1"]
+    finally:
+        db_manager.close()
+
+
+def test_up_to_date_database_is_left_alone(legacy_db_path):
+    DatabaseManager(legacy_db_path).close()
+
+    conn = sqlite3.connect(legacy_db_path, isolation_level=None)
+    try:
+        assert migrations.run_migrations(conn) == 0
+    finally:
+        conn.close()
+
+
+def test_failed_migration_rolls_back(db_manager, db_path, monkeypatch):
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS + [
+        (LATEST_VERSION + 1, "adds a table, then fails", """
+            CREATE TABLE half_done (id INTEGER);
+            SELECT * FROM missing_table;
+        """),
+    ])
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            migrations.run_migrations(conn)
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+    finally:
+        conn.close()
+    assert _version(db_path) == LATEST_VERSION
+
+
+def test_plain_sqlite_clients_can_change_chat_messages(db_manager, db_path):
+    session_manager = SessionManager(db_manager)
+    session_manager.store_chat_history("s1", "gehun ka bhav", LONG_RESPONSE)
+
+    # No application SQL functions are registered on this connection
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("INSERT INTO chat_messages (session_id, user_message, assistant_response) VALUES ('s2', 'hi', 'hello')")
+        conn.execute("UPDATE chat_messages SET user_message = 'namaste' WHERE session_id = 's2'")
+        conn.execute("DELETE FROM chat_messages WHERE session_id = 's1'")
+        conn.commit()
+    finally:
+        conn.close()
+
+    assert session_manager.search("quintal") == []
+
+
+def test_search_index_keeps_no_copy_of_the_text(db_manager):
+    session_manager = SessionManager(db_manager)
+    session_manager.store_chat_history("s1", "gehun ka bhav", LONG_RESPONSE)
+    db_manager.flush_writes()
+
+    rows = db_manager.execute_query("SELECT user_message, assistant_response FROM chat_messages_fts")
+    assert [tuple(row) for row in rows] == [(None, None)]
+    assert [hit["session_id"] for hit in session_manager.search("quintal")] == ["s1"]
+    assert [hit["session_id"] for hit in session_manager.search("gehun")] == ["s1"]
@@ -0,0 +1,52 @@
+import pytest
+
+from agents import crew_manager
+from agents.crew_manager import MandiSaathiCrew
+
+PRICE_DATA = {
+    "source": "cache",
+    "data": {"modal_price": 1800, "min_price": 1600, "max_price": 2000, "variety": "Red", "grade": "FAQ",
+             "market_date": "2026-10-18"},
+    "neighboring_prices": [{"district": "Pune", "modal_price": 1900}],
+}
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    calls = []
+
+    def get_market_prices(state, district, commodity):
+        calls.append((state, district, commodity))
+        return PRICE_DATA if district == "Nashik" else None
+
+    monkeypatch.setattr(crew_manager.price_service, "get_market_prices", get_market_prices)
+    return calls
+
+
+def _fast_task(state, district, commodity):
+    context_data = {"extracted_info": {"state": state, "district": district, "commodity": commodity}}
+    return MandiSaathiCrew()._create_price_only_fast_task("pyaz ka bhav Nashik", "", context_data)
+
+
+def test_complete_fields_build_one_communicator_task(lookups):
+    task = _fast_task("maharashtra", "nashik", "pyaz")
+
+    assert lookups == [("Maharashtra", "Nashik", "Onion")]
+    assert task.agent.role == crew_manager.create_communicator_agent().role
+    assert "Modal Price: ₹1800.00 per quintal" in task.description
+    assert "- Pune: ₹1900.00 (Modal)" in task.description
+
+
+@pytest.mark.parametrize("state, district, commodity", [
+    ("Maharashtra", None, "Onion"),       # missing field
+    ("Maharashtra", "Nasik", "Onion"),    # spelling correction goes through Price Discovery
+    ("Atlantis", "Nashik", "Onion"),      # unknown state
+])
+def test_unresolved_fields_skip_the_lookup(lookups, state, district, commodity):
+    assert _fast_task(state, district, commodity) is None
+    assert lookups == []
+
+
+def test_no_price_data_falls_back(lookups):
+    assert _fast_task("Maharashtra", "Pune", "Onion") is None
+    assert lookups == [("Maharashtra", "Pune", "Onion")]
@@ -0,0 +1,53 @@
+from database.cache_manager import CacheManager
+from utils.api_client import DataGovAPIClient
+from utils.price_ingester import PriceIngester
+
+
+class FakeDataGovAPIClient(DataGovAPIClient):
+    """Serves a fixed list of records newest-first, one page per call"""
+
+    def __init__(self, records):
+        self.records = sorted(records, key=lambda r: "/".join(reversed(r["Arrival_Date"].split("/"))), reverse=True)
+        self.calls = 0
+
+    def fetch_records_page(self, offset=0, limit=1000, filters=None, sort=None):
+        self.calls += 1
+        return {"records": self.records[offset:offset + limit], "total": len(self.records)}
+
+
+def _record(day, district="Ballia"):
+    return {
+        "State": "Uttar Pradesh", "District": district, "Market": district, "Commodity": "Tomato",
+        "Variety": "Local", "Grade": "FAQ", "Modal_Price": "1500", "Min_Price": "1400", "Max_Price": "1600",
+        "Arrival_Date": f"{day:02d}/10/2026",
+    }
+
+
+def _sync_state(db_manager):
+    rows = db_manager.execute_query("SELECT last_arrival_date, record_count FROM price_sync_state")
+    return [tuple(row) for row in rows]
+
+
+def test_capped_delta_keeps_the_watermark(db_manager):
+    CacheManager(db_manager).record_sync_state({"Uttar Pradesh": "2026-10-10"}, {"Uttar Pradesh": 5})
+    records = [_record(day, district) for day in (11, 12, 13) for district in ("Ballia", "Agra")]
+    ingester = PriceIngester(db_manager, api_client=FakeDataGovAPIClient(records), page_size=2)
+
+    result = ingester.sync_delta(max_pages=1)
+
+    assert result["status"] == "partial"
+    assert result["incomplete_states"] == ["Uttar Pradesh"]
+    assert _sync_state(db_manager) == [("2026-10-10", 5)]
+
+
+def test_complete_delta_advances_the_watermark_and_adds_to_the_count(db_manager):
+    CacheManager(db_manager).record_sync_state({"Uttar Pradesh": "2026-10-10"}, {"Uttar Pradesh": 5})
+    records = [_record(day) for day in (9, 10, 11, 12)]
+    ingester = PriceIngester(db_manager, api_client=FakeDataGovAPIClient(records), page_size=2)
+
+    result = ingester.sync_delta()
+
+    assert result["status"] == "ok"
+    assert result["states"] == {"Uttar Pradesh": 3}
+    # The re-fetched watermark day was already counted
+    assert _sync_state(db_manager) == [("2026-10-12", 7)]
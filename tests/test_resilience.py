@@ -0,0 +1,76 @@
+import time
+
+from utils.resilience import CircuitBreaker, RetryPolicy
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=60)
+
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.STATE_CLOSED
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.STATE_OPEN
+    assert not breaker.allow_request()
+    assert breaker.get_stats()["rejected_requests"] == 1
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=60)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.STATE_CLOSED
+    assert breaker.get_stats()["consecutive_failures"] == 2
+
+
+def test_half_open_lets_one_trial_through_and_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=0.05)
+    breaker.record_failure()
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.STATE_HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # Only one trial while it is in flight
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.STATE_CLOSED
+    assert breaker.allow_request()
+
+
+def test_failed_trial_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=5, cooldown_seconds=0.05)
+    for _ in range(5):
+        breaker.record_failure()
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.STATE_OPEN
+    assert not breaker.allow_request()
+
+
+def test_retry_delay_is_jittered_within_the_cap():
+    policy = RetryPolicy(base_delay=0.5, max_delay=2.0)
+
+    for retry_count in range(6):
+        delay = policy.compute_delay(retry_count)
+        assert 0 <= delay <= min(2.0, 0.5 * 2 ** retry_count)
+
+
+def test_retries_stop_at_the_budget_or_deadline():
+    policy = RetryPolicy(max_retries=2, deadline_seconds=1.0)
+    started_at = time.monotonic()
+
+    assert policy.should_retry(1, started_at, delay=0.1)
+    assert not policy.should_retry(2, started_at, delay=0.1)
+    assert not policy.should_retry(0, started_at, delay=2.0)
+    assert not policy.should_retry(0, started_at - 5, delay=0.1)
@@ -0,0 +1,52 @@
+from agents.routing_cache import RoutingCache
+
+ANALYSIS = {"intent": "PRICE_ONLY", "extracted_info": {"commodity": "Onion", "district": "Nashik"}}
+
+
+def test_key_ignores_case_and_punctuation_but_not_history_or_model(db_manager):
+    cache = RoutingCache(db_manager)
+    key = cache.make_key("Pyaz ka bhav, Nashik?", "", "model-a")
+
+    assert cache.make_key("pyaz ka  bhav nashik", "", "model-a") == key
+    assert cache.make_key("pyaz ka bhav nashik", "User: namaste", "model-a") != key
+    assert cache.make_key("pyaz ka bhav nashik", "", "model-b") != key
+    assert cache.make_key("pyaz ka bhav nashik 2", "", "model-a") != key
+
+
+def test_entries_survive_a_restart_and_are_copies(db_manager):
+    cache = RoutingCache(db_manager)
+    key = cache.make_key("pyaz ka bhav Nashik", "", "model-a")
+    cache.set(key, ANALYSIS)
+
+    cached = cache.get(key)
+    cached["extracted_info"]["commodity"] = "Tomato"
+    assert cache.get(key) == ANALYSIS
+
+    restarted = RoutingCache(db_manager)
+    assert restarted.get(key) == ANALYSIS
+    assert restarted.get_stats()["db_hits"] == 1
+
+
+def test_expired_entries_are_misses_and_cleaned_up(db_manager):
+    cache = RoutingCache(db_manager, ttl_hours=1)
+    key = cache.make_key("pyaz ka bhav Nashik", "", "model-a")
+    cache.set(key, ANALYSIS)
+    db_manager.flush_writes()
+    with db_manager.transaction() as conn:
+        conn.execute("UPDATE routing_cache SET created_at = datetime('now', '-2 hours')")
+
+    assert RoutingCache(db_manager, ttl_hours=1).get(key) is None
+    assert cache.cleanup_expired() == 1
+
+
+def test_table_keeps_the_most_recently_used_entries(db_manager):
+    cache = RoutingCache(db_manager, max_entries=2)
+    for message in ("pyaz", "tamatar", "aloo"):
+        cache.set(cache.make_key(message, "", "model-a"), ANALYSIS)
+        db_manager.flush_writes()
+        # Give each row a distinct, increasing last_used_at
+        with db_manager.transaction() as conn:
+            conn.execute("UPDATE routing_cache SET last_used_at = datetime(last_used_at, '-1 minute')")
+
+    assert db_manager.execute_query("SELECT COUNT(*) FROM routing_cache")[0][0] == 2
+    assert RoutingCache(db_manager).get(cache.make_key("pyaz", "", "model-a")) is None
@@ -0,0 +1,88 @@
+import tempfile
+from pathlib import Path
+
+from hypothesis import given, settings, strategies as st
+
+from database.db_manager import DatabaseManager
+from database.session_manager import SessionManager
+
+
+def _add_sessions(db_manager, sessions):
+    """Insert (session_id, last_updated) pairs directly"""
+    with db_manager.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO chat_sessions (session_id, created_at, last_updated, first_message, message_count)"
+            " VALUES (?, ?, ?, 'pyaz ka bhav', 1)",
+            [(session_id, last_updated, last_updated) for session_id, last_updated in sessions]
+        )
+
+
+def _all_pages(session_manager, limit):
+    pages = []
+    cursor = None
+    while True:
+        page, cursor = session_manager.list_sessions(limit=limit, before=cursor)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_session_once_newest_first(db_manager):
+    # Several sessions share a timestamp, so the session_id tie-break matters
+    _add_sessions(db_manager, [
+        (f"s{i:02d}", f"2026-10-{10 + i // 4:02d} 09:00:00") for i in range(23)
+    ])
+    session_manager = SessionManager(db_manager)
+
+    pages = _all_pages(session_manager, limit=5)
+
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+    listed = [session["session_id"] for page in pages for session in page]
+    assert listed == [f"s{i:02d}" for i in reversed(range(23))]
+
+
+def test_last_full_page_has_no_cursor(db_manager):
+    _add_sessions(db_manager, [(f"s{i}", "2026-10-18 09:00:00") for i in range(4)])
+    session_manager = SessionManager(db_manager)
+
+    first, cursor = session_manager.list_sessions(limit=2)
+    second, cursor = session_manager.list_sessions(limit=2, before=cursor)
+
+    assert len(first) == len(second) == 2
+    assert cursor is None
+    assert session_manager.list_sessions(limit=2)[0] == first
+
+
+def test_new_sessions_do_not_shift_later_pages(db_manager):
+    _add_sessions(db_manager, [(f"s{i}", f"2026-10-{10 + i:02d} 09:00:00") for i in range(6)])
+    session_manager = SessionManager(db_manager)
+
+    first, cursor = session_manager.list_sessions(limit=3)
+    # A chat started while the farmer is paging lands on top, not inside the next page
+    _add_sessions(db_manager, [("new", "2026-10-30 09:00:00")])
+    second, cursor = session_manager.list_sessions(limit=3, before=cursor)
+
+    assert [s["session_id"] for s in first] == ["s5", "s4", "s3"]
+    assert [s["session_id"] for s in second] == ["s2", "s1", "s0"]
+    assert cursor is None
+
+
+@settings(max_examples=40, deadline=None)
+@given(
+    timestamps=st.lists(st.integers(min_value=0, max_value=5), max_size=40),
+    limit=st.integers(min_value=1, max_value=8)
+)
+def test_paging_matches_a_full_sort(timestamps, limit):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager = DatabaseManager(str(Path(tmp_dir) / "paging.db"))
+        try:
+            sessions = [(f"s{i:03d}", f"2026-10-1{hour} 09:00:00") for i, hour in enumerate(timestamps)]
+            _add_sessions(db_manager, sessions)
+
+            pages = _all_pages(SessionManager(db_manager), limit)
+
+            listed = [(s["session_id"], s["last_updated"]) for page in pages for s in page]
+            assert listed == sorted(sessions, key=lambda s: (s[1], s[0]), reverse=True)
+            assert all(len(page) == limit for page in pages[:-1])
+        finally:
+            db_manager.close()
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def _run_concurrently(flight, key, fn, callers=5):
+    """Start callers together; return their results and raised errors"""
+    results = []
+    errors = []
+    lock = threading.Lock()
+
+    def call():
+        try:
+            value = flight.do(key, fn)
+            with lock:
+                results.append(value)
+        except Exception as e:
+            with lock:
+                errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results, errors
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    executions = []
+
+    def fetch():
+        executions.append(1)
+        time.sleep(0.1)
+        return {"modal_price": 1800}
+
+    results, errors = _run_concurrently(flight, ("up", "agra", "onion"), fetch)
+
+    assert not errors
+    assert len(executions) == 1
+    assert results == [{"modal_price": 1800}] * 5
+    stats = flight.get_stats()
+    assert stats["executions"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["in_flight"] == 0
+
+
+def test_error_is_raised_to_every_waiting_caller():
+    flight = SingleFlight()
+    executions = []
+
+    def fetch():
+        executions.append(1)
+        time.sleep(0.1)
+        raise ValueError("upstream down")
+
+    results, errors = _run_concurrently(flight, "key", fetch)
+
+    assert not results
+    assert len(executions) == 1
+    assert len(errors) == 5
+    assert all(str(error) == "upstream down" for error in errors)
+
+
+def test_next_call_after_completion_runs_again():
+    flight = SingleFlight()
+    calls = []
+
+    assert flight.do("key", lambda: calls.append(1) or "first") == "first"
+    assert flight.do("key", lambda: calls.append(1) or "second") == "second"
+    assert len(calls) == 2
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        flight.do("key", fail)
+    # A failed call is not remembered either
+    assert flight.do("key", lambda: "third") == "third"
+
+
+def test_different_keys_do_not_wait_on_each_other():
+    flight = SingleFlight()
+    release = threading.Event()
+    slow_result = []
+
+    def slow_call():
+        slow_result.append(flight.do("slow", lambda: release.wait(5) and "slow"))
+
+    slow = threading.Thread(target=slow_call)
+    slow.start()
+    time.sleep(0.05)
+
+    assert flight.do("fast", lambda: "fast") == "fast"
+    release.set()
+    slow.join(5)
+    assert slow_result == ["slow"]
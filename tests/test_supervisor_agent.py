@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import openai
+import pytest
+from pydantic import ValidationError
+
+import config
+from agents.supervisor_agent import SupervisorAgent, SupervisorAnalysis
+
+HISTORY = [{"user": "tamatar ka bhav Ballia", "assistant": "Ballia mein tamatar Rs 1500/quintal hai"}]
+
+
+class FakeCompletions:
+    """Records parse() calls and answers with a fixed analysis or error"""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    def parse(self, **kwargs):
+        self.calls.append(kwargs)
+        if isinstance(self.result, Exception):
+            raise self.result
+        message = SimpleNamespace(parsed=self.result, refusal=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def _analysis(**overrides):
+    fields = {
+        "intent": "PRICE_ONLY",
+        "confidence": 0.8,
+        "reasoning": "Asks for a price",
+        "extracted_info": {"state": None, "district": None, "commodity": None, "offered_price": None, "quantity": None},
+        "price_from_history": {"available": False, "commodity": None, "modal_price": None, "location": None},
+        "missing_fields": [],
+        "direct_response": None,
+    }
+    fields.update(overrides)
+    return SupervisorAnalysis(**fields)
+
+
+def _supervisor(result):
+    supervisor = SupervisorAgent()
+    supervisor.routing_cache = None
+    completions = FakeCompletions(result)
+    supervisor.client = SimpleNamespace(beta=SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    return supervisor, completions
+
+
+def test_structured_output_request_and_local_fields():
+    supervisor, completions = _supervisor(_analysis())
+
+    analysis = supervisor.analyze_query("aur Agra mein pyaz?", chat_history=HISTORY)
+
+    request = completions.calls[0]
+    assert request["response_format"] is SupervisorAnalysis
+    assert request["reasoning_effort"] == config.SUPERVISOR_REASONING_EFFORT
+    assert request["max_completion_tokens"] == config.SUPERVISOR_MAX_COMPLETION_TOKENS
+    assert analysis["intent"] == "PRICE_ONLY"
+    # Fields the model left empty are filled from the local extraction
+    assert analysis["extracted_info"]["commodity"] == "Onion"
+    assert analysis["extracted_info"]["district"] == "Agra"
+
+
+def test_truncated_output_falls_back_with_local_fields():
+    completion = SimpleNamespace(usage=None, choices=[])
+    supervisor, _ = _supervisor(openai.LengthFinishReasonError(completion=completion))
+
+    analysis = supervisor.analyze_query("aur Agra mein pyaz?", chat_history=HISTORY)
+
+    assert analysis["intent"] == SupervisorAgent.INTENT_FULL_WORKFLOW
+    assert analysis["extracted_info"]["commodity"] == "Onion"
+
+
+def test_analysis_schema():
+    assert _analysis(confidence=1.7).confidence == 1.0
+    with pytest.raises(ValidationError):
+        _analysis(intent="SMALL_TALK")
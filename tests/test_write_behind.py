@@ -0,0 +1,134 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from database.db_manager import DatabaseManager
+from database.session_manager import SessionManager
+from database.write_behind import WriteBehindQueue
+
+
+@pytest.fixture
+def queue_db(tmp_path):
+    path = str(tmp_path / "queue.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (value INTEGER UNIQUE)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _connect(path):
+    return lambda: sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+
+
+def _insert(value):
+    return lambda conn: conn.execute("INSERT INTO items (value) VALUES (?)", (value,))
+
+
+def _values(path):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(row[0] for row in conn.execute("SELECT value FROM items"))
+    finally:
+        conn.close()
+
+
+def test_flush_applies_queued_writes_in_batches(queue_db):
+    queue = WriteBehindQueue(_connect(queue_db), batch_size=10, flush_interval=0.05)
+    try:
+        for value in range(25):
+            queue.submit(_insert(value))
+
+        assert queue.flush(5)
+        assert queue.pending() == 0
+        assert _values(queue_db) == list(range(25))
+        assert queue.get_stats()["writes"] == 25
+    finally:
+        queue.close()
+
+
+def test_failing_write_does_not_drop_the_rest_of_its_batch(queue_db):
+    queue = WriteBehindQueue(_connect(queue_db), batch_size=10, flush_interval=0.05)
+    try:
+        for value in (1, 2, 2, 3):  # The second 2 violates UNIQUE
+            queue.submit(_insert(value))
+        queue.flush(5)
+
+        assert _values(queue_db) == [1, 2, 3]
+        assert queue.get_stats()["failures"] == 1
+    finally:
+        queue.close()
+
+
+def test_close_flushes_and_later_writes_run_synchronously(queue_db):
+    queue = WriteBehindQueue(_connect(queue_db), flush_interval=0.5)
+    queue.submit(_insert(1))
+    queue.close()
+
+    assert _values(queue_db) == [1]
+
+    queue.submit(_insert(2))
+    assert _values(queue_db) == [1, 2]
+    assert queue.get_stats()["sync_fallbacks"] == 1
+
+
+def test_full_queue_falls_back_to_synchronous_writes(queue_db):
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocking_write(conn):
+        started.set()
+        release.wait(5)
+
+    queue = WriteBehindQueue(_connect(queue_db), max_queue=1, batch_size=1, flush_interval=0)
+    try:
+        queue.submit(blocking_write)  # Occupies the writer
+        assert started.wait(5)
+        queue.submit(_insert(1))  # Fills the queue
+        # Applied by the caller, once the writer's transaction finishes
+        caller = threading.Thread(target=queue.submit, args=(_insert(2),))
+        caller.start()
+        deadline = time.monotonic() + 5
+        while queue.get_stats()["sync_fallbacks"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        release.set()
+        caller.join(5)
+        assert queue.get_stats()["sync_fallbacks"] == 1
+    finally:
+        release.set()
+        queue.close()
+
+    assert _values(queue_db) == [1, 2]
+
+
+def test_writes_submitted_during_close_are_not_lost(queue_db):
+    queue = WriteBehindQueue(_connect(queue_db), flush_interval=0.001)
+
+    def submit_many(start):
+        for value in range(start, start + 200):
+            queue.submit(_insert(value))
+
+    threads = [threading.Thread(target=submit_many, args=(start,)) for start in range(0, 800, 200)]
+    for thread in threads:
+        thread.start()
+    queue.close()
+    for thread in threads:
+        thread.join(10)
+
+    assert _values(queue_db) == list(range(800))
+
+
+def test_reads_see_queued_chat_writes(db_path):
+    db_manager = DatabaseManager(db_path, write_behind=True, write_behind_settings={"flush_interval": 0.5})
+    try:
+        session_manager = SessionManager(db_manager)
+        session_manager.store_chat_history("s1", "pyaz ka bhav", "1800 rupaye")
+        session_manager.store_chat_history("s1", "aur tamatar?", "1200 rupaye")
+
+        history = session_manager.retrieve_chat_history("s1")
+        assert [turn["user"] for turn in history] == ["pyaz ka bhav", "aur tamatar?"]
+        assert session_manager.get_session_summary("s1")["message_count"] == 2
+    finally:
+        db_manager.close()
@@ -0,0 +1,187 @@
+import re
+from typing import Any, Dict, List
+from tools.location_tools import INDIAN_STATES, STATE_ALIASES
+from tools.price_tools import COMMODITY_MAPPINGS
+
+QUANTITY_UNITS = {
+    "quintal": "quintal", "quintals": "quintal", "qtl": "quintal", "kuntal": "quintal", "kwintal": "quintal",
+    "kg": "kg", "kgs": "kg", "kilo": "kg", "kilogram": "kg",
+    "ton": "ton", "tons": "ton", "tonne": "ton", "tonnes": "ton",
+    "bori": "bag", "bag": "bag", "bags": "bag", "katta": "bag",
+}
+
+NUMBER = r"(\d+(?:,\d{2,3})*(?:\.\d+)?)"
+NUMBER_PATTERN = re.compile(NUMBER)
+UNIT_ALTERNATION = "|".join(sorted(QUANTITY_UNITS, key=len, reverse=True))
+QUANTITY_PATTERN = re.compile(NUMBER + r"\s*(" + UNIT_ALTERNATION + r")\b")
+CURRENCY_MARKER = r"(?:rs\b\.?|rupaye|rupees?|rupay|₹|/-)"
+PER_KG = r"\s*(?:/|per|prati|ka|ke|ki)?\s*(?:kg|kgs|kilo|kilogram)\b"
+KG_PER_QUINTAL = 100
+# A per-kg amount: "20 rs kilo", "₹20/kg", "rs 20 per kilo", "20 rupaye kilo"
+PER_KG_PATTERN = re.compile(
+    r"(?:rs\.?|inr|₹)\s*" + NUMBER + PER_KG
+    + r"|" + NUMBER + r"\s*" + CURRENCY_MARKER + PER_KG
+    + r"|" + NUMBER + r"\s*(?:/|per|prati)\s*(?:kg|kgs|kilo|kilogram)\b"
+)
+# An amount written with a currency marker: "rs 1500", "₹1500", "1500 rupaye", "1500/-"
+CURRENCY_PATTERN = re.compile(
+    r"(?:rs\.?|inr|₹)\s*" + NUMBER + r"|" + NUMBER + r"\s*" + CURRENCY_MARKER
+)
+# An amount next to a trader's offer: "trader 1500 bol raha hai", "offer 1500", "1500 de raha"
+OFFER_PATTERN = re.compile(
+    r"\b(?:trader|vyapari|byapari|seth|offer|offering|bol\w*|de|keh\w*)\b\D{0,20}?" + NUMBER
+    + r"|" + NUMBER + r"\s*(?:bol\w*|de|di|diya|keh\w*|offer\w*|laga\w*)\b"
+)
+# Numbers that count time or goods rather than rupees: "2 din pehle", "50 quintal", "10%"
+NOT_AN_AMOUNT = re.compile(
+    r"\s*(?:%|(?:din|dino|ghante|ghanta|hafte|hafta|mahine|mahina|saal|baje|minute|min|"
+    r"hours?|days?|weeks?|months?|years?|percent|" + UNIT_ALTERNATION + r")\b)"
+)
+PRICE_WORDS = re.compile(r"\b(price|rate|bhav|bhaav|bhao|daam|keemat|kimat|mandi)\b")
+
+
+def _collapse(text: str) -> str:
+    """Fold repeated letters so "pyaaz" and "tamaatar" match their usual spelling"""
+    return re.sub(r"([a-z])\1+", r"\1", text)
+
+
+def _to_number(value: str) -> float:
+    number = float(value.replace(",", ""))
+    return int(number) if number.is_integer() else number
+
+
+def _amount_group(match) -> int:
+    """Index of the alternative that matched in a multi-branch amount pattern"""
+    return next(index for index in range(1, len(match.groups()) + 1) if match.group(index))
+
+
+def _inside(position: int, spans: List) -> bool:
+    return any(span[0] <= position < span[1] for span in spans)
+
+
+class EntityExtractor:
+    """
+    Extracts commodity, location, offered price and quantity from a farmer's
+    message without an LLM.
+
+    All vocabulary terms are compiled into one alternation, so a message is
+    scanned once however many commodities and districts are known.
+    """
+
+    def __init__(self):
+        self._commodities = {}
+        for name, commodity in COMMODITY_MAPPINGS.items():
+            self._commodities[_collapse(name)] = commodity
+
+        self._states = {}
+        self._districts = {}
+        for state, districts in INDIAN_STATES.items():
+            self._states[_collapse(state)] = state.title()
+            for district in districts:
+                self._districts[_collapse(district.lower())] = (district, state.title())
+        # Two-letter aliases ("up", "mp") are ordinary words in Hinglish, so
+        # they only count when written in capitals (checked separately)
+        self._state_codes = {alias.upper(): STATE_ALIASES[alias].title() for alias in STATE_ALIASES}
+
+        terms = set(self._commodities) | set(self._states) | set(self._districts)
+        alternation = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+        self._vocabulary = re.compile(r"\b(" + alternation + r")\b")
+        self._state_code_pattern = re.compile(r"\b(" + "|".join(self._state_codes) + r")\b")
+
+    def extract(self, message: str) -> Dict[str, Any]:
+        """
+        Return the extracted_info fields plus "confident", which is True when
+        exactly one commodity and one consistent location were found and the
+        message mentions at most one rupee amount.
+        """
+        text = message.lower()
+        commodities = []
+        states = []
+        districts = []
+        for match in self._vocabulary.finditer(_collapse(text)):
+            term = match.group(1)
+            if term in self._commodities:
+                commodities.append(self._commodities[term])
+            elif term in self._districts:
+                districts.append(self._districts[term])
+            else:
+                states.append(self._states[term])
+        states.extend(self._state_codes[code] for code in self._state_code_pattern.findall(message))
+
+        per_kg_spans = [match.span() for match in PER_KG_PATTERN.finditer(text)]
+        quantity, quantity_spans = self._extract_quantity(text, per_kg_spans)
+        offered_price, amount_count = self._extract_offered_price(text, quantity_spans)
+        if amount_count > 1:
+            # "2 din pehle 1200 bola, aaj 1500 de raha" - which one is the
+            # offer is for the LLM to decide, not a regex
+            offered_price = None
+
+        commodity = commodities[0] if len(set(commodities)) == 1 else None
+        district = districts[0][0] if len(set(districts)) == 1 else None
+        state = states[0] if len(set(states)) == 1 else None
+        if district and not state:
+            state = districts[0][1]
+        location_consistent = bool(district) and state == districts[0][1]
+
+        return {
+            "state": state,
+            "district": district,
+            "commodity": commodity,
+            "offered_price": offered_price,
+            "quantity": quantity,
+            "asks_price": bool(PRICE_WORDS.search(text)),
+            "confident": bool(commodity) and location_consistent and amount_count <= 1
+        }
+
+    def _extract_quantity(self, text: str, per_kg_spans: List):
+        """First "<number> <unit>" that is not the "kilo" of a per-kg price"""
+        for match in QUANTITY_PATTERN.finditer(text):
+            if _inside(match.start(), per_kg_spans):
+                continue
+            amount = _to_number(match.group(1))
+            return f"{amount} {QUANTITY_UNITS[match.group(2)]}", [match.span()]
+        return None, []
+
+    def _extract_offered_price(self, text: str, quantity_spans: List):
+        """
+        Return (offered price per quintal, number of distinct rupee amounts).
+
+        Per-kg amounts are converted to per quintal. Otherwise amounts with a
+        currency marker win over amounts next to an offer word; numbers that
+        count days, hours or goods are never amounts.
+        """
+        offered_price = None
+        amounts = set()
+        excluded_spans = list(quantity_spans)
+        for match in PER_KG_PATTERN.finditer(text):
+            amount = _to_number(match.group(_amount_group(match))) * KG_PER_QUINTAL
+            amounts.add(amount)
+            excluded_spans.append(match.span())
+            if offered_price is None:
+                offered_price = amount
+
+        for match in NUMBER_PATTERN.finditer(text):
+            if not _inside(match.start(), excluded_spans) and not NOT_AN_AMOUNT.match(text, match.end()):
+                amounts.add(_to_number(match.group(1)))
+
+        for pattern in (CURRENCY_PATTERN, OFFER_PATTERN):
+            if offered_price is not None:
+                break
+            for match in pattern.finditer(text):
+                group = _amount_group(match)
+                if _inside(match.start(group), excluded_spans) or NOT_AN_AMOUNT.match(text, match.end(group)):
+                    continue
+                offered_price = _to_number(match.group(group))
+                break
+        return offered_price, len(amounts)
+
+
+_extractor = None
+
+
+def get_entity_extractor() -> EntityExtractor:
+    """Shared extractor; the vocabulary pattern is compiled once per process"""
+    global _extractor
+    if _extractor is None:
+        _extractor = EntityExtractor()
+    return _extractor
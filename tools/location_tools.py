@@ -1,7 +1,7 @@
 from crewai.tools import tool
-from typing import List
+from typing import List, Optional, Tuple
 from difflib import get_close_matches
-from utils.api_client import DataGovAPIClient
+from utils.api_client import get_api_client
 
 # Common state and district mappings for India
 INDIAN_STATES = {
@@ -26,6 +26,37 @@ STATE_ALIASES = {
     "mh": "maharashtra",
 }
 
+def normalize_location(state: str, district: str) -> Tuple[Optional[str], Optional[str], bool]:
+    """
+    Resolve state and district names against the local table without the API.
+    
+    Returns (state, district, corrected). State is None when it cannot be
+    matched and district is None when it is not a known district of the state.
+    Corrected is True when either name needed a spelling correction rather
+    than an exact or alias match.
+    """
+    state_normalized = state.lower().strip()
+    state_normalized = STATE_ALIASES.get(state_normalized, state_normalized)
+    corrected = False
+    if state_normalized not in INDIAN_STATES:
+        state_matches = get_close_matches(state_normalized, list(INDIAN_STATES.keys()), n=1, cutoff=0.6)
+        if not state_matches:
+            return None, None, False
+        state_normalized = state_matches[0]
+        corrected = True
+    
+    districts = INDIAN_STATES[state_normalized]
+    districts_lower = [d.lower() for d in districts]
+    district_normalized = district.lower().strip()
+    if district_normalized in districts_lower:
+        return state_normalized.title(), districts[districts_lower.index(district_normalized)], corrected
+    
+    district_matches = get_close_matches(district_normalized, districts_lower, n=1, cutoff=0.6)
+    if district_matches:
+        return state_normalized.title(), districts[districts_lower.index(district_matches[0])], True
+    
+    return state_normalized.title(), None, corrected
+
 @tool("Get Districts for State")
 def get_districts_for_state(state_name: str) -> str:
     """
@@ -48,7 +79,7 @@ def get_districts_for_state(state_name: str) -> str:
 
     # Try to fetch from API first
     try:
-        api_client = DataGovAPIClient()
+        api_client = get_api_client()
         # Convert to title case for API (e.g., "Uttar Pradesh")
         state_title = state_normalized.title()
         api_districts = api_client.fetch_districts_for_state(state_title)
@@ -87,34 +118,16 @@ def validate_location(state: str, district: str) -> str:
     Returns:
         Validation result with corrections if applicable
     """
-    # Normalize inputs
-    state_normalized = state.lower().strip()
-    district_normalized = district.lower().strip()
-    
-    # Check state aliases
-    if state_normalized in STATE_ALIASES:
-        state_normalized = STATE_ALIASES[state_normalized]
-    
-    # Validate state
-    if state_normalized not in INDIAN_STATES:
-        state_matches = get_close_matches(state_normalized, list(INDIAN_STATES.keys()), n=1, cutoff=0.6)
-        if state_matches:
-            state_normalized = state_matches[0]
-        else:
-            return f"Invalid state: {state}"
+    state_name, district_name, corrected = normalize_location(state, district)
     
-    # Validate district
-    districts = INDIAN_STATES[state_normalized]
-    districts_lower = [d.lower() for d in districts]
+    if state_name is None:
+        return f"Invalid state: {state}"
     
-    if district_normalized in districts_lower:
-        idx = districts_lower.index(district_normalized)
-        return f"Valid location: {state_normalized.title()}, {districts[idx]}"
+    if district_name is None:
+        districts = INDIAN_STATES[state_name.lower()]
+        return f"District '{district}' not found in {state_name}. Available: {', '.join(districts)}"
     
-    # Try fuzzy matching for district
-    district_matches = get_close_matches(district_normalized, districts_lower, n=1, cutoff=0.6)
-    if district_matches:
-        idx = districts_lower.index(district_matches[0])
-        return f"Corrected location: {state_normalized.title()}, {districts[idx]} (from '{district}')"
+    if corrected:
+        return f"Corrected location: {state_name}, {district_name} (from '{state}, {district}')"
     
-    return f"District '{district}' not found in {state_normalized.title()}. Available: {', '.join(districts)}"
+    return f"Valid location: {state_name}, {district_name}"
@@ -1,3 +1,4 @@
+import config
 from crewai.tools import tool
 from difflib import get_close_matches
 from database.db_manager import DatabaseManager
@@ -6,13 +7,17 @@ from utils.price_service import PriceService
 # Commodity name mappings (Hindi/Hinglish to English)
 COMMODITY_MAPPINGS = {
     "tamatar": "Tomato",
+    "tamater": "Tomato",
     "aalu": "Potato",
     "alu": "Potato",
+    "aloo": "Potato",
     "pyaz": "Onion",
+    "pyaj": "Onion",
     "onion": "Onion",
     "tomato": "Tomato",
     "potato": "Potato",
     "gobi": "Cauliflower",
+    "gobhi": "Cauliflower",
     "cauliflower": "Cauliflower",
     "bhindi": "Lady Finger",
     "ladyfinger": "Lady Finger",
@@ -24,6 +29,7 @@ COMMODITY_MAPPINGS = {
     "chilli": "Chilli",
     "chili": "Chilli",
     "baigan": "Brinjal",
+    "baingan": "Brinjal",
     "brinjal": "Brinjal",
     "eggplant": "Brinjal",
     "gajar": "Carrot",
@@ -33,6 +39,8 @@ COMMODITY_MAPPINGS = {
     "sarson": "Mustard",
     "mustard": "Mustard",
     "gehun": "Wheat",
+    "gehu": "Wheat",
+    "gehoon": "Wheat",
     "wheat": "Wheat",
     "chawal": "Rice",
     "rice": "Rice",
@@ -41,7 +49,11 @@ COMMODITY_MAPPINGS = {
 }
 
 # Initialize database and price service
-db_manager = DatabaseManager()
+db_manager = DatabaseManager(
+    config.DATABASE_PATH,
+    write_behind=config.WRITE_BEHIND_ENABLED,
+    write_behind_settings=config.WRITE_BEHIND_SETTINGS
+)
 price_service = PriceService(db_manager)
 
 def normalize_commodity_name(commodity: str) -> str:
@@ -83,12 +95,16 @@ def fetch_mandi_prices(state: str, district: str, commodity: str) -> str:
     if not price_data:
         return f"No price data available for {normalized_commodity} in {district}, {state}. Try nearby markets."
     
+    return format_price_info(state, district, normalized_commodity, price_data)
+
+def format_price_info(state: str, district: str, commodity: str, price_data: dict) -> str:
+    """Format a PriceService result as the price summary given to agents"""
     data = price_data["data"]
     source = price_data["source"]
     
     # Format response
     response = f"""
-Price Information for {normalized_commodity} in {district}, {state}:
+Price Information for {commodity} in {district}, {state}:
 - Modal Price: ₹{data['modal_price']:.2f} per quintal
 - Price Range: ₹{data['min_price']:.2f} - ₹{data['max_price']:.2f}
 - Variety: {data.get('variety', 'Not specified')}
@@ -1,46 +1,128 @@
 import requests
+import threading
 import time
 from typing import Dict, List, Optional
+from requests.adapters import HTTPAdapter
+from utils.resilience import RetryPolicy, CircuitBreaker
 import config
 
 class DataGovAPIClient:
     """Client for data.gov.in API to fetch mandi prices"""
     
-    def __init__(self):
+    def __init__(self, pool_size: int = None, retry_policy: RetryPolicy = None,
+                 circuit_breaker: CircuitBreaker = None):
         self.base_url = config.DATA_GOV_API_URL
         self.resource_id = config.DATA_GOV_RESOURCE_ID
         self.api_key = config.DATA_GOV_API_KEY
-        self.max_retries = 3
-        self.retry_delay = 2  # seconds
+        self.timeout = config.API_TIMEOUT_SECONDS
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_retries=config.API_MAX_RETRIES,
+            base_delay=config.API_RETRY_BASE_DELAY,
+            deadline_seconds=config.API_RETRY_DEADLINE_SECONDS
+        )
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(
+            failure_threshold=config.API_BREAKER_FAILURE_THRESHOLD,
+            cooldown_seconds=config.API_BREAKER_COOLDOWN_SECONDS
+        )
+        self.pool_size = pool_size or config.API_POOL_SIZE
+        self.session = self._create_session()
+        self._stats_lock = threading.Lock()
+        self._request_count = 0
     
-    def _make_request(self, params: Dict, retry_count: int = 0) -> Optional[Dict]:
-        """Make API request with retry logic"""
-        try:
-            # Add API key and format to params
-            request_params = {
-                "api-key": self.api_key,
-                "format": "json",
-                **params
-            }
-
-            response = requests.get(
-                f"{self.base_url}/{self.resource_id}",
-                params=request_params,
-                timeout=15
-            )
-            
-            response.raise_for_status()
-            return response.json()
-            
-        except requests.exceptions.RequestException as e:
-            if retry_count < self.max_retries:
-                # Exponential backoff
-                wait_time = self.retry_delay * (2 ** retry_count)
-                time.sleep(wait_time)
-                return self._make_request(params, retry_count + 1)
-            else:
-                print(f"API request failed after {self.max_retries} retries: {e}")
+    def _create_session(self) -> requests.Session:
+        """Create a keep-alive session with a bounded connection pool"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,  # Only one host (api.data.gov.in)
+            pool_maxsize=self.pool_size,
+            pool_block=True  # Wait for a free connection instead of opening extras
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    
+    def get_pool_stats(self) -> Dict:
+        """Return connection pool usage, including the connection reuse ratio"""
+        connections_opened = 0
+        adapter = self.session.get_adapter(self.base_url)
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections_opened += pool.num_connections
+        
+        with self._stats_lock:
+            requests_made = self._request_count
+        
+        reused = max(requests_made - connections_opened, 0)
+        return {
+            "pool_size": self.pool_size,
+            "requests": requests_made,
+            "connections_opened": connections_opened,
+            "reused_requests": reused,
+            "reuse_ratio": round(reused / requests_made, 3) if requests_made else 0.0
+        }
+    
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+    
+    def is_upstream_healthy(self) -> bool:
+        """Check if data.gov.in is currently considered reachable"""
+        return self.circuit_breaker.state != CircuitBreaker.STATE_OPEN
+    
+    def get_breaker_stats(self) -> Dict:
+        """Return circuit breaker state"""
+        return self.circuit_breaker.get_stats()
+    
+    def _make_request(self, params: Dict) -> Optional[Dict]:
+        """Make API request with jittered retries, a deadline and a circuit breaker"""
+        # Add API key and format to params
+        request_params = {
+            "api-key": self.api_key,
+            "format": "json",
+            **params
+        }
+        started_at = time.monotonic()
+        retry_count = 0
+        
+        while True:
+            if not self.circuit_breaker.allow_request():
+                print("API circuit open, skipping data.gov.in request")
                 return None
+            
+            try:
+                with self._stats_lock:
+                    self._request_count += 1
+
+                response = self.session.get(
+                    f"{self.base_url}/{self.resource_id}",
+                    params=request_params,
+                    timeout=min(self.timeout, max(self.retry_policy.remaining(started_at), 1))
+                )
+                
+                response.raise_for_status()
+                data = response.json()
+                self.circuit_breaker.record_success()
+                return data
+                
+            except requests.exceptions.RequestException as e:
+                status = e.response.status_code if getattr(e, "response", None) is not None else None
+                if status is not None and 400 <= status < 500 and status != 429:
+                    # Client errors will not succeed on retry and say nothing about upstream health
+                    self.circuit_breaker.record_success()
+                    print(f"API request rejected ({status}): {e}")
+                    return None
+                
+                self.circuit_breaker.record_failure()
+                delay = self.retry_policy.compute_delay(retry_count)
+                if not self.retry_policy.should_retry(retry_count, started_at, delay):
+                    print(f"API request failed after {retry_count} retries: {e}")
+                    return None
+                
+                time.sleep(delay)
+                retry_count += 1
     
     def fetch_mandi_prices(self, state: str, district: str, commodity: str,
                           limit: int = 100) -> Optional[List[Dict]]:
@@ -75,6 +157,24 @@ class DataGovAPIClient:
             return response_data["records"]
         return None
     
+    def fetch_records_page(self, offset: int = 0, limit: int = 1000,
+                           filters: Dict = None, sort: Dict = None) -> Optional[Dict]:
+        """Fetch one page of raw records from the resource with offset/limit paging"""
+        params = {"offset": offset, "limit": limit}
+        for field, value in (filters or {}).items():
+            params[f"filters[{field}]"] = value
+        for field, direction in (sort or {}).items():
+            params[f"sort[{field}]"] = direction
+        
+        response_data = self._make_request(params)
+        
+        if response_data and "records" in response_data:
+            return {
+                "records": response_data["records"],
+                "total": int(response_data.get("total", 0) or 0)
+            }
+        return None
+    
     def fetch_districts_for_state(self, state: str) -> Optional[List[str]]:
         """Fetch all districts for a given state from data.gov.in API"""
         params = {
@@ -105,8 +205,33 @@ class DataGovAPIClient:
                 "modal_price": float(record.get("Modal_Price", 0)),
                 "min_price": float(record.get("Min_Price", 0)),
                 "max_price": float(record.get("Max_Price", 0)),
-                "price_date": record.get("Arrival_Date", "")
+                "price_date": iso_arrival_date(record.get("Arrival_Date", ""))
             }
         except (ValueError, TypeError) as e:
             print(f"Error parsing price record: {e}")
             return None
+
+
+def iso_arrival_date(arrival_date: str) -> str:
+    """Convert a data.gov.in Arrival_Date (dd/mm/yyyy) to a sortable yyyy-mm-dd"""
+    parts = arrival_date.split("/") if arrival_date else []
+    if len(parts) == 3:
+        day, month, year = parts
+        return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+    return arrival_date or ""
+
+
+# Process-wide shared client so every caller reuses the same connection pool
+_shared_client: Optional[DataGovAPIClient] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_api_client() -> DataGovAPIClient:
+    """Get the shared DataGovAPIClient instance, creating it on first use"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = DataGovAPIClient()
+    return _shared_client
+
@@ -0,0 +1,237 @@
+"""
+Bulk ingestion of the data.gov.in mandi price resource into the local store.
+
+Run from the command line:
+    python -m utils.price_ingester snapshot
+    python -m utils.price_ingester delta [--state "Uttar Pradesh" ...]
+
+or from a scheduler:
+    from utils.price_ingester import run_snapshot_job, run_delta_job
+    run_snapshot_job()
+    run_delta_job()
+"""
+import argparse
+import time
+from typing import Dict, List, Optional, Tuple
+from utils.api_client import DataGovAPIClient, get_api_client, iso_arrival_date
+from database.cache_manager import CacheManager
+from database.db_manager import DatabaseManager
+import config
+
+
+class PriceIngester:
+    """Pages through the mandi price resource and loads it into SQLite"""
+
+    def __init__(self, db_manager: DatabaseManager, api_client: DataGovAPIClient = None,
+                 page_size: int = 1000):
+        self.api_client = api_client or get_api_client()
+        self.cache_manager = CacheManager(db_manager)
+        self.page_size = page_size
+
+    def _fetch_all_records(self, max_pages: int = None) -> Tuple[Optional[List[Dict]], bool]:
+        """
+        Fetch every record of the resource with offset/limit paging.
+
+        Returns the records and whether the whole resource was fetched
+        (False when max_pages stopped the run before the reported total).
+        """
+        records = []
+        offset = 0
+        pages = 0
+
+        while True:
+            page = self.api_client.fetch_records_page(offset=offset, limit=self.page_size)
+            if page is None:
+                # Abort rather than load a partial snapshot
+                return None, False
+
+            records.extend(page["records"])
+            pages += 1
+            offset += len(page["records"])
+
+            if page["total"]:
+                if offset >= page["total"]:
+                    return records, True
+                if not page["records"]:
+                    # The resource shrank while paging; the total is out of date
+                    return records, False
+            elif not page["records"] or len(page["records"]) < self.page_size:
+                return records, True
+            if max_pages and pages >= max_pages:
+                return records, False
+
+    def ingest_snapshot(self, max_pages: int = None) -> Dict:
+        """Download the full daily resource and replace the matching rows in market_prices"""
+        started_at = time.monotonic()
+        raw_records, complete = self._fetch_all_records(max_pages=max_pages)
+        if raw_records is None:
+            return {"status": "failed", "records": 0, "seconds": round(time.monotonic() - started_at, 2)}
+
+        parsed_records = []
+        state_dates = {}
+        state_counts = {}
+        for record in raw_records:
+            parsed = self.api_client.parse_price_record(record)
+            if not parsed or not parsed["state"] or not parsed["price_date"]:
+                continue
+            parsed_records.append(parsed)
+
+            state = parsed["state"]
+            state_counts[state] = state_counts.get(state, 0) + 1
+            if parsed["price_date"] > state_dates.get(state, ""):
+                state_dates[state] = parsed["price_date"]
+
+        if not complete:
+            # A capped run only adds what it saw: replacing whole market dates or
+            # marking states as synced would hide every record it did not fetch
+            loaded = self.cache_manager.upsert_market_prices(parsed_records)
+            return {
+                "status": "partial",
+                "records": loaded,
+                "states": len(state_dates),
+                "seconds": round(time.monotonic() - started_at, 2)
+            }
+
+        loaded = self.cache_manager.replace_market_prices_bulk(parsed_records)
+        self.cache_manager.record_sync_state(state_dates, state_counts)
+
+        return {
+            "status": "ok",
+            "records": loaded,
+            "states": len(state_dates),
+            "seconds": round(time.monotonic() - started_at, 2)
+        }
+
+    def _fetch_state_since(self, state: str, watermark: str = None,
+                           max_pages: int = None) -> Tuple[Optional[List[Dict]], bool]:
+        """
+        Fetch records for a state newest-first, stopping once arrivals fall below the watermark.
+
+        Records on the watermark date itself are fetched again so late arrivals
+        for that day are picked up; the upsert keeps them from duplicating.
+        Returns the records and whether the fetch reached the watermark (False
+        when max_pages stopped it while older arrivals were still unread).
+        """
+        watermark_key = iso_arrival_date(watermark) if watermark else ""
+        records = []
+        offset = 0
+        pages = 0
+
+        while True:
+            page = self.api_client.fetch_records_page(
+                offset=offset,
+                limit=self.page_size,
+                filters={"State": state},
+                sort={"Arrival_Date": "desc"}
+            )
+            if page is None:
+                return None, False
+
+            reached_watermark = False
+            for record in page["records"]:
+                if watermark_key and iso_arrival_date(record.get("Arrival_Date", "")) < watermark_key:
+                    reached_watermark = True
+                    break
+                records.append(record)
+
+            pages += 1
+            offset += len(page["records"])
+
+            if reached_watermark or len(page["records"]) < self.page_size:
+                return records, True
+            if page["total"] and offset >= page["total"]:
+                return records, True
+            if max_pages and pages >= max_pages:
+                return records, False
+
+    def sync_delta(self, states: List[str] = None, max_pages: int = None) -> Dict:
+        """Fetch only arrivals newer than each state's watermark and upsert them"""
+        started_at = time.monotonic()
+        watermarks = self.cache_manager.get_sync_watermarks()
+        states = states or sorted(watermarks.keys())
+
+        synced = {}
+        failed = []
+        incomplete = []
+        for state in states:
+            raw_records, complete = self._fetch_state_since(state, watermarks.get(state), max_pages=max_pages)
+            if raw_records is None:
+                failed.append(state)
+                continue
+
+            parsed_records = [
+                parsed for parsed in (self.api_client.parse_price_record(r) for r in raw_records)
+                if parsed and parsed["price_date"]
+            ]
+            self.cache_manager.upsert_market_prices(parsed_records)
+            synced[state] = len(parsed_records)
+
+            if not complete:
+                # Older arrivals between these pages and the watermark were never
+                # read; moving the watermark (or marking the state fresh) would
+                # skip them for good
+                incomplete.append(state)
+                continue
+
+            watermark_key = iso_arrival_date(watermarks[state]) if watermarks.get(state) else ""
+            last_date = watermark_key
+            new_records = 0
+            for parsed in parsed_records:
+                last_date = max(last_date, parsed["price_date"])
+                # Records on the watermark date were counted by the previous run
+                if parsed["price_date"] > watermark_key:
+                    new_records += 1
+            if last_date:
+                self.cache_manager.record_sync_state({state: last_date}, {state: new_records}, add_counts=True)
+
+        return {
+            "status": "ok" if not failed and not incomplete else "partial",
+            "records": sum(synced.values()),
+            "states": synced,
+            "failed_states": failed,
+            "incomplete_states": incomplete,
+            "seconds": round(time.monotonic() - started_at, 2)
+        }
+
+def run_snapshot_job(db_path: str = None, page_size: int = 1000, max_pages: int = None) -> Dict:
+    """Entry point for schedulers: load today's full snapshot"""
+    db_manager = DatabaseManager(db_path or config.DATABASE_PATH)
+    ingester = PriceIngester(db_manager, page_size=page_size)
+    return ingester.ingest_snapshot(max_pages=max_pages)
+
+
+def run_delta_job(db_path: str = None, states: List[str] = None, page_size: int = 1000,
+                  max_pages: int = None) -> Dict:
+    """Entry point for schedulers: sync arrivals newer than each state's watermark"""
+    db_manager = DatabaseManager(db_path or config.DATABASE_PATH)
+    ingester = PriceIngester(db_manager, page_size=page_size)
+    return ingester.sync_delta(states=states, max_pages=max_pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load data.gov.in mandi prices into the local database")
+    parser.add_argument("mode", choices=["snapshot", "delta"],
+                        help="snapshot: load the full daily resource, delta: only new arrivals per state")
+    parser.add_argument("--db", default=config.DATABASE_PATH, help="SQLite database path")
+    parser.add_argument("--state", action="append", dest="states",
+                        help="State to delta-sync (repeatable, defaults to every synced state)")
+    parser.add_argument("--page-size", type=int, default=1000, help="Records per API page")
+    parser.add_argument("--max-pages", type=int, default=None, help="Stop after this many pages")
+    args = parser.parse_args()
+
+    if args.mode == "delta":
+        result = run_delta_job(db_path=args.db, states=args.states,
+                               page_size=args.page_size, max_pages=args.max_pages)
+        print(f"Delta sync {result['status']}: {result['records']} records in {result['seconds']}s")
+        if result["failed_states"]:
+            print(f"Failed states: {', '.join(result['failed_states'])}")
+        if result["incomplete_states"]:
+            print(f"Stopped by --max-pages before the watermark: {', '.join(result['incomplete_states'])}")
+        return
+
+    result = run_snapshot_job(db_path=args.db, page_size=args.page_size, max_pages=args.max_pages)
+    print(f"Snapshot ingestion {result['status']}: {result['records']} records in {result['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,108 +1,259 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
-from utils.api_client import DataGovAPIClient
+from utils.api_client import get_api_client
+from utils.single_flight import SingleFlight
 from database.cache_manager import CacheManager
 from database.db_manager import DatabaseManager
+import config
 
 class PriceService:
     """Service layer for fetching prices with caching and fallback"""
     
     def __init__(self, db_manager: DatabaseManager):
-        self.api_client = DataGovAPIClient()
+        self.api_client = get_api_client()
         self.cache_manager = CacheManager(db_manager)
+        self._single_flight = SingleFlight()
+        self.state_slice_limit = config.PRICE_STATE_SLICE_LIMIT
+        self.stale_grace_hours = config.CACHE_STALE_GRACE_HOURS
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="price-refresh")
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
     
     def get_market_prices(self, state: str, district: str, commodity: str) -> Optional[Dict]:
         """Get market prices with caching and fallback"""
-        # Try cache first
+        # Repeated misses are answered from memory before touching disk or network
+        if self.cache_manager.is_known_miss(state, district, commodity, memory_only=True):
+            return None
+        
+        # Try cache / local snapshot first
+        local_result = self._get_local_prices(state, district, commodity)
+        if local_result:
+            return local_result
+        
+        # Recently expired: answer now with the stale price and refresh behind the scenes
+        stale_result = self._get_stale_price(state, district, commodity)
+        if stale_result:
+            return stale_result
+        
+        # data.gov.in recently had nothing for this lookup, don't ask again yet
+        if self.cache_manager.is_known_miss(state, district, commodity):
+            return None
+        
+        # Upstream is down: answer from the last saved price instead of waiting on retries
+        if not self.api_client.is_upstream_healthy():
+            return self._get_degraded_price(state, district, commodity)
+        
+        # Today's snapshot is complete for this state, the API would not know more
+        if self.cache_manager.has_fresh_snapshot(state):
+            return None
+        
+        # Identical lookups running at the same time share one upstream call
+        return self._single_flight.do(
+            self._lookup_key(state, district, commodity),
+            lambda: self._fetch_from_api(state, district, commodity)
+        )
+    
+    def _lookup_key(self, state: str, district: str, commodity: str) -> tuple:
+        """Normalised key identifying one price lookup"""
+        return (state.strip().lower(), district.strip().lower(), commodity.strip().lower())
+    
+    def _fetch_from_api(self, state: str, district: str, commodity: str) -> Optional[Dict]:
+        """
+        Fetch prices from data.gov.in with a single state x commodity query.
+
+        The primary district price, neighbour prices and the fallback are all
+        derived in memory from that one slice. Only when the slice is
+        truncated and the district is missing from it is a district query made.
+        """
+        try:
+            records = self.api_client.fetch_prices_by_state_commodity(
+                state, commodity, limit=self.state_slice_limit
+            )
+            district_records = self._filter_district(records, district)
+            
+            if not district_records and self._is_truncated(records):
+                district_records = self.api_client.fetch_mandi_prices(state, district, commodity)
+            
+            return self._build_result_or_miss(records, district_records, state, district, commodity)
+        except Exception as e:
+            print(f"Error fetching from API: {e}")
+        
+        return None
+    
+    async def aget_market_prices(self, state: str, district: str, commodity: str) -> Optional[Dict]:
+        """
+        Async variant of get_market_prices for callers running an event loop.
+
+        The whole lookup runs on a worker thread, so cache checks and the
+        single-flight upstream call stay in one place.
+        """
+        return await asyncio.to_thread(self.get_market_prices, state, district, commodity)
+    
+    def get_metrics(self) -> Dict:
+        """Return request coalescing, connection pool and circuit breaker metrics"""
+        return {
+            "single_flight": self._single_flight.get_stats(),
+            "memory_cache": self.cache_manager.get_cache_stats(),
+            "connection_pool": self.api_client.get_pool_stats(),
+            "circuit_breaker": self.api_client.get_breaker_stats()
+        }
+    
+    def _get_local_prices(self, state: str, district: str, commodity: str) -> Optional[Dict]:
+        """Answer from the local price store (request cache and bulk snapshot)"""
         cached_price = self.cache_manager.get_cached_price(state, district, commodity)
         if cached_price:
             return {
                 "source": "cache",
                 "data": cached_price,
-                "neighboring_prices": []
+                "neighboring_prices": self.cache_manager.get_state_prices(
+                    state, commodity, exclude_district=district
+                )
             }
         
-        # Try API
-        try:
-            api_records = self.api_client.fetch_mandi_prices(state, district, commodity)
-            
-            if api_records and len(api_records) > 0:
-                # Parse and cache the first record
-                parsed = self.api_client.parse_price_record(api_records[0])
-                
-                if parsed:
-                    # Store in cache
-                    self.cache_manager.store_market_price(
-                        state=parsed["state"],
-                        district=parsed["district"],
-                        commodity=parsed["commodity"],
-                        modal_price=parsed["modal_price"],
-                        min_price=parsed["min_price"],
-                        max_price=parsed["max_price"],
-                        variety=parsed["variety"],
-                        grade=parsed["grade"],
-                        market_date=parsed["price_date"]
-                    )
-                    
-                    # Get neighboring district prices
-                    neighboring = self._get_neighboring_prices(state, commodity, district)
-                    
-                    return {
-                        "source": "api",
-                        "data": parsed,
-                        "neighboring_prices": neighboring
-                    }
-        except Exception as e:
-            print(f"Error fetching from API: {e}")
+        if self.cache_manager.has_fresh_snapshot(state):
+            nearby = self.cache_manager.get_state_prices(state, commodity, limit=1)
+            if nearby:
+                return {
+                    "source": "snapshot",
+                    "data": nearby[0],
+                    "neighboring_prices": [],
+                    "note": f"Data from {nearby[0]['district']} (nearby market) as {district} data unavailable"
+                }
+        
+        return None
+    
+    def _get_stale_price(self, state: str, district: str, commodity: str) -> Optional[Dict]:
+        """Serve a recently expired price immediately and schedule a background refresh"""
+        if self.stale_grace_hours <= 0:
+            return None
+        
+        stale_price = self.cache_manager.get_stale_price(
+            state, district, commodity, grace_hours=self.stale_grace_hours
+        )
+        if not stale_price:
+            return None
         
-        # Fallback: Try to get prices from nearby districts
-        fallback_data = self._fallback_to_nearby_markets(state, commodity, district)
-        if fallback_data:
-            return fallback_data
+        # A fresh snapshot already holds everything the API would return
+        if self.api_client.is_upstream_healthy() and not self.cache_manager.has_fresh_snapshot(state):
+            self._schedule_refresh(state, district, commodity)
         
+        return {
+            "source": "cache_stale",
+            "data": stale_price,
+            "neighboring_prices": [],
+            "age_hours": stale_price["age_hours"],
+            "note": f"Saved price is {stale_price['age_hours']} hours old; a fresh price is being fetched"
+        }
+    
+    def _schedule_refresh(self, state: str, district: str, commodity: str):
+        """Refresh one price in the background, at most once at a time per lookup"""
+        key = self._lookup_key(state, district, commodity)
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        
+        def refresh():
+            try:
+                self._single_flight.do(key, lambda: self._fetch_from_api(state, district, commodity))
+            except Exception as e:
+                print(f"Background price refresh failed: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+        
+        self._refresh_executor.submit(refresh)
+    
+    def _get_degraded_price(self, state: str, district: str, commodity: str) -> Optional[Dict]:
+        """Serve the latest cached price, however old, while data.gov.in is unhealthy"""
+        stale_price = self.cache_manager.get_cached_price(state, district, commodity, allow_expired=True)
+        if stale_price:
+            return {
+                "source": "cache",
+                "data": stale_price,
+                "neighboring_prices": [],
+                "note": f"Live prices are unavailable right now; showing last saved price from {stale_price['cached_at']}"
+            }
         return None
     
-    def _get_neighboring_prices(self, state: str, commodity: str, 
-                               exclude_district: str = None) -> List[Dict]:
-        """Get prices from neighboring districts"""
-        try:
-            records = self.api_client.fetch_prices_by_state_commodity(state, commodity, limit=5)
-            
-            if not records:
-                return []
-            
-            neighboring = []
-            for record in records:
-                if exclude_district and record.get("district") == exclude_district:
-                    continue
-                
-                parsed = self.api_client.parse_price_record(record)
-                if parsed:
-                    neighboring.append(parsed)
-            
-            return neighboring[:3]  # Return top 3
-        except Exception as e:
-            print(f"Error fetching neighboring prices: {e}")
-            return []
+    def _filter_district(self, records: Optional[List[Dict]], district: str) -> List[Dict]:
+        """Pick the records for one district out of a state-wide slice"""
+        district_key = district.strip().lower()
+        return [
+            record for record in records or []
+            if (record.get("District") or "").strip().lower() == district_key
+        ]
     
-    def _fallback_to_nearby_markets(self, state: str, commodity: str, 
-                                   original_district: str) -> Optional[Dict]:
-        """Fallback to nearby markets when primary location unavailable"""
-        try:
-            # Try to get any prices from the state
-            records = self.api_client.fetch_prices_by_state_commodity(state, commodity, limit=10)
+    def _is_truncated(self, records: Optional[List[Dict]]) -> bool:
+        """Check if a state-wide slice hit its limit and may be missing districts"""
+        return records is not None and len(records) >= self.state_slice_limit
+    
+    def _build_result(self, records: Optional[List[Dict]], district_records: Optional[List[Dict]],
+                      district: str) -> Optional[Dict]:
+        """Derive the primary price, neighbours and fallback from fetched records"""
+        latest_per_district = self._latest_per_district(records)
+        
+        parsed = self.api_client.parse_price_record(district_records[0]) if district_records else None
+        if parsed:
+            self.cache_manager.upsert_market_prices([parsed] + latest_per_district)
+            return {
+                "source": "api",
+                "data": parsed,
+                "neighboring_prices": self._select_neighbors(latest_per_district, district)
+            }
+        
+        if latest_per_district:
+            self.cache_manager.upsert_market_prices(latest_per_district)
+            return self._build_fallback(latest_per_district, district)
+        
+        return None
+    
+    def _build_result_or_miss(self, records: Optional[List[Dict]], district_records: Optional[List[Dict]],
+                              state: str, district: str, commodity: str) -> Optional[Dict]:
+        """Build the result, negatively caching lookups the API answered with no records"""
+        result = self._build_result(records, district_records, district)
+        if result is None and records is not None:
+            self.cache_manager.store_price_miss(state, district, commodity)
+        return result
+    
+    def _latest_per_district(self, records: Optional[List[Dict]]) -> List[Dict]:
+        """Parse the newest record of each district (records arrive sorted newest first)"""
+        latest = []
+        seen_districts = set()
+        for record in records or []:
+            district_key = (record.get("District") or "").strip().lower()
+            if not district_key or district_key in seen_districts:
+                continue
             
-            if records and len(records) > 0:
-                parsed = self.api_client.parse_price_record(records[0])
-                
-                if parsed:
-                    return {
-                        "source": "fallback",
-                        "data": parsed,
-                        "neighboring_prices": [],
-                        "note": f"Data from {parsed['district']} (nearby market) as {original_district} data unavailable"
-                    }
-        except Exception as e:
-            print(f"Fallback failed: {e}")
+            parsed = self.api_client.parse_price_record(record)
+            if parsed:
+                seen_districts.add(district_key)
+                latest.append(parsed)
+        return latest
+    
+    def _select_neighbors(self, parsed_records: List[Dict],
+                          exclude_district: str = None) -> List[Dict]:
+        """Pick up to 3 neighbour prices, excluding the farmer's own district"""
+        exclude_key = exclude_district.strip().lower() if exclude_district else None
+        neighboring = [
+            parsed for parsed in parsed_records
+            if parsed["district"].strip().lower() != exclude_key
+        ]
+        return neighboring[:3]  # Return top 3
+    
+    def _build_fallback(self, parsed_records: List[Dict],
+                        original_district: str) -> Optional[Dict]:
+        """Fallback to the nearest available market when the district has no data"""
+        if parsed_records:
+            parsed = parsed_records[0]
+            return {
+                "source": "fallback",
+                "data": parsed,
+                "neighboring_prices": [],
+                "note": f"Data from {parsed['district']} (nearby market) as {original_district} data unavailable"
+            }
         
         return None
     
@@ -0,0 +1,110 @@
+import random
+import threading
+import time
+from typing import Dict
+
+
+class RetryPolicy:
+    """Jittered exponential backoff bounded by an overall deadline"""
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5,
+                 max_delay: float = 4.0, deadline_seconds: float = 20.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline_seconds = deadline_seconds
+
+    def compute_delay(self, retry_count: int) -> float:
+        """Full-jitter backoff: random wait between 0 and the capped exponential delay"""
+        capped = min(self.max_delay, self.base_delay * (2 ** retry_count))
+        return random.uniform(0, capped)
+
+    def should_retry(self, retry_count: int, started_at: float, delay: float) -> bool:
+        """Check if another attempt fits in both the retry budget and the deadline"""
+        if retry_count >= self.max_retries:
+            return False
+        return time.monotonic() + delay < started_at + self.deadline_seconds
+
+    def remaining(self, started_at: float) -> float:
+        """Seconds left before the overall deadline"""
+        return max(0.0, started_at + self.deadline_seconds - time.monotonic())
+
+
+class CircuitBreaker:
+    """
+    Fails fast while an upstream is unhealthy.
+
+    CLOSED: requests flow normally and failures are counted.
+    OPEN: requests are rejected until the cool-down window passes.
+    HALF_OPEN: one trial request is let through; success closes the
+    breaker, failure opens it again.
+    """
+
+    STATE_CLOSED = "CLOSED"
+    STATE_OPEN = "OPEN"
+    STATE_HALF_OPEN = "HALF_OPEN"
+
+    def __init__(self, failure_threshold: int = 5, cooldown_seconds: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._state = self.STATE_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._rejected_count = 0
+
+    @property
+    def state(self) -> str:
+        """Current breaker state, moving OPEN to HALF_OPEN once the cool-down has passed"""
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    def _refresh_state(self):
+        if self._state == self.STATE_OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            self._state = self.STATE_HALF_OPEN
+            self._trial_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Check if a request may be sent upstream"""
+        with self._lock:
+            self._refresh_state()
+            if self._state == self.STATE_CLOSED:
+                return True
+            if self._state == self.STATE_HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._rejected_count += 1
+            return False
+
+    def record_success(self):
+        """Record a successful upstream call"""
+        with self._lock:
+            self._state = self.STATE_CLOSED
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Record a failed upstream call, opening the breaker past the threshold"""
+        with self._lock:
+            self._consecutive_failures += 1
+            if (self._state == self.STATE_HALF_OPEN
+                    or self._consecutive_failures >= self.failure_threshold):
+                self._state = self.STATE_OPEN
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def get_stats(self) -> Dict:
+        """Return breaker state for health checks and logging"""
+        with self._lock:
+            self._refresh_state()
+            retry_in = 0.0
+            if self._state == self.STATE_OPEN:
+                retry_in = max(0.0, self.cooldown_seconds - (time.monotonic() - self._opened_at))
+            return {
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "rejected_requests": self._rejected_count,
+                "retry_in_seconds": round(retry_in, 1)
+            }